@@ -0,0 +1,194 @@
+#  AffineTransform.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+
+from __future__ import division
+
+import math
+
+
+class Affine(object):
+    """!
+    An immutable 2D affine transform
+
+        ( a  b  c )
+        ( d  e  f )
+
+    mapping (x, y) to (a * x + b * y + c, d * x + e * y + f).
+
+    Indexing gives the elements in the order a, b, c, d, e, f, so an
+    Affine can stand in for the 6-element lists the drawing aids used
+    to take. Whether the transform is the identity, a plain translation
+    or a similarity (keeping circles circular) is worked out once, when
+    it is made, so the drawing code can take the short cuts cheaply.
+    """
+
+    __slots__ = ('a', 'b', 'c', 'd', 'e', 'f', 'det',
+                 'is_identity', 'is_translation', 'is_similarity')
+
+    def __init__(self, a=1, b=0, c=0, d=0, e=1, f=0):
+        _set = object.__setattr__
+        _set(self, 'a', a)
+        _set(self, 'b', b)
+        _set(self, 'c', c)
+        _set(self, 'd', d)
+        _set(self, 'e', e)
+        _set(self, 'f', f)
+        _set(self, 'det', a * e - b * d)
+
+        translation = a == 1 and b == 0 and d == 0 and e == 1
+        _set(self, 'is_translation', translation)
+        _set(self, 'is_identity', translation and c == 0 and f == 0)
+
+        scale = a * a + d * d
+        eps = 1e-9 * scale
+        _set(self, 'is_similarity', scale > 0 and
+             abs(b * b + e * e - scale) <= eps and abs(a * b + d * e) <= eps)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Affine transforms cannot be changed")
+
+    @classmethod
+    def From(cls, mat):
+        """!
+        The transform for an Affine or a sequence (a, b, c, d, e, f)
+        """
+        if isinstance(mat, cls):
+            return mat
+        return cls(*mat)
+
+    @classmethod
+    def Translation(cls, x, y):
+        """!
+        A translation by (x, y)
+        """
+        if x == 0 and y == 0:
+            return cls.IDENTITY
+        return cls(1, 0, x, 0, 1, y)
+
+    @classmethod
+    def Scale(cls, sx, sy=None):
+        """!
+        A scale about the origin, uniform if sy is not given
+        """
+        if sy is None:
+            sy = sx
+        return cls(sx, 0, 0, 0, sy, 0)
+
+    @classmethod
+    def Rotation(cls, degrees):
+        """!
+        A rotation about the origin, clockwise on screen
+
+        Multiples of 90 degrees give the exact cached matrices, without
+        the rounding errors of sin and cos.
+        """
+        quarter, rest = divmod(degrees, 90)
+        if rest == 0:
+            return cls._quarterTurns[int(quarter) % 4]
+
+        rads = math.radians(degrees)
+        c, s = math.cos(rads), math.sin(rads)
+        return cls(c, -s, 0, s, c, 0)
+
+    def __getitem__(self, i):
+        return (self.a, self.b, self.c, self.d, self.e, self.f)[i]
+
+    def __len__(self):
+        return 6
+
+    def __iter__(self):
+        return iter((self.a, self.b, self.c, self.d, self.e, self.f))
+
+    def __eq__(self, other):
+        try:
+            return len(other) == 6 and tuple(self) == tuple(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return "Affine(%r, %r, %r, %r, %r, %r)" % tuple(self)
+
+    def __mul__(self, other):
+        """!
+        The transform applying other, then self
+        """
+        other = Affine.From(other)
+        if self.is_identity:
+            return other
+        if other.is_identity:
+            return self
+
+        a, b, c, d, e, f = self.a, self.b, self.c, self.d, self.e, self.f
+        return Affine(a * other.a + b * other.d,
+                      a * other.b + b * other.e,
+                      a * other.c + b * other.f + c,
+                      d * other.a + e * other.d,
+                      d * other.b + e * other.e,
+                      d * other.c + e * other.f + f)
+
+    def About(self, x, y):
+        """!
+        The same transform, but about the point (x, y) rather than the
+        origin: a translation to the origin, this transform and a
+        translation back, fused into one matrix
+        """
+        a, b, d, e = self.a, self.b, self.d, self.e
+        return Affine(a, b, x - a * x - b * y + self.c,
+                      d, e, y - d * x - e * y + self.f)
+
+    def Apply(self, x, y):
+        """!
+        The point (x, y) transformed, as an (x, y) tuple
+        """
+        if self.is_translation:
+            return (x + self.c, y + self.f)
+
+        return (self.a * x + self.b * y + self.c,
+                self.d * x + self.e * y + self.f)
+
+    def ApplyAll(self, pts):
+        """!
+        A sequence of (x, y) points transformed, as a list of tuples
+        """
+        if self.is_identity:
+            return [(x, y) for x, y in pts]
+
+        a, b, c, d, e, f = self.a, self.b, self.c, self.d, self.e, self.f
+        return [(a * x + b * y + c, d * x + e * y + f) for x, y in pts]
+
+
+Affine.IDENTITY = Affine()
+
+# flips about the origin, of x, y and both (a half turn)
+Affine.FLIP_X = Affine(-1, 0, 0, 0, 1, 0)
+Affine.FLIP_Y = Affine(1, 0, 0, 0, -1, 0)
+Affine.FLIP_BOTH = Affine(-1, 0, 0, 0, -1, 0)
+
+# quarter turns, clockwise on screen
+Affine.ROTATE_90 = Affine(0, -1, 0, 1, 0, 0)
+Affine.ROTATE_180 = Affine.FLIP_BOTH
+Affine.ROTATE_270 = Affine(0, 1, 0, -1, 0, 0)
+
+Affine._quarterTurns = (Affine.IDENTITY, Affine.ROTATE_90,
+                        Affine.ROTATE_180, Affine.ROTATE_270)
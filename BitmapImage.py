@@ -0,0 +1,476 @@
+#  BitmapImage.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+
+"""
+Streaming bitmap ingestion for footprint artwork
+
+Images are read one row at a time and thresholded into rows of b'1'
+(draw) and b'0' (leave blank) bytes, so the whole image is never held in
+memory. Binary PBM/PGM rows are sliced straight out of a memory-mapped
+file. The thresholded rows can then be reduced to merged rectangles or
+to polygons, again one row at a time.
+
+Supported formats:
+    PBM (P1, P4), PGM (P2, P5, 8 and 16 bit)
+    PNG (8 bit grey, grey+alpha, RGB and RGBA, non-interlaced)
+"""
+
+from __future__ import division
+
+import mmap
+import re
+import struct
+import zlib
+
+_RUN = re.compile(b'1+')
+
+# bits of a PBM byte, most significant (leftmost pixel) first
+_BYTE_BITS = [('{0:08b}'.format(v)).encode('ascii') for v in range(256)]
+
+# bytes.translate() table swapping b'0' and b'1'
+_SWAP = bytearray(range(256))
+_SWAP[ord('0')], _SWAP[ord('1')] = ord('1'), ord('0')
+_SWAP = bytes(_SWAP)
+
+
+def _ThresholdTable(threshold, invert):
+    """!
+    A 256-entry bytes.translate() table mapping a grey level to b'1' if
+    the pixel is drawn
+
+    @param threshold: grey levels below this (0-256) are dark
+    @param invert: draw the light pixels instead of the dark ones
+    """
+    dark, light = (b'0', b'1') if invert else (b'1', b'0')
+    return b''.join([dark if v < threshold else light for v in range(256)])
+
+
+class PNMImage(object):
+    """!
+    A PBM or PGM image, read row by row
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            header = f.read(1024)
+
+        self.magic = header[:2]
+
+        if self.magic not in (b'P1', b'P2', b'P4', b'P5'):
+            raise ValueError("Not a PBM/PGM image: %s" % path)
+
+        is_bitmap = self.magic in (b'P1', b'P4')
+        tokens, self.offset = self._ParseHeader(header, 2 if is_bitmap else 3)
+
+        self.width, self.height = tokens[0], tokens[1]
+        self.maxval = 1 if is_bitmap else tokens[2]
+
+        if self.width < 1 or self.height < 1:
+            raise ValueError("Empty image: %s" % path)
+
+        if not 0 < self.maxval < 65536:
+            raise ValueError("Bad maximum grey value: %d" % self.maxval)
+
+    @staticmethod
+    def _ParseHeader(header, count):
+        """!
+        Read count integers after the magic number, skipping comments
+
+        @return the integers and the offset of the first raster byte
+        """
+        tokens = []
+        pos = 2
+        while len(tokens) < count:
+            while pos < len(header) and header[pos:pos + 1].isspace():
+                pos += 1
+            if header[pos:pos + 1] == b'#':
+                pos = header.index(b'\n', pos)
+                continue
+            start = pos
+            while pos < len(header) and header[pos:pos + 1].isdigit():
+                pos += 1
+            if start == pos:
+                raise ValueError("Malformed PNM header")
+            tokens.append(int(header[start:pos]))
+
+        # exactly one whitespace character separates header and raster
+        return tokens, pos + 1
+
+    def Rows(self, threshold=128, invert=False):
+        """!
+        Generate the thresholded rows, top to bottom
+
+        @param threshold: grey level (0-256) below which a PGM pixel is dark
+        @param invert: draw light pixels instead of dark ones
+        """
+        if self.magic == b'P4':
+            return self._BitmapRows(invert)
+        if self.magic == b'P5':
+            return self._GreyRows(threshold, invert)
+        return self._PlainRows(threshold, invert)
+
+    def _Raster(self, f):
+        """!
+        Memory-map the file, which lets rows be sliced out without
+        reading the whole raster
+        """
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _BitmapRows(self, invert):
+        stride = (self.width + 7) // 8
+        with open(self.path, 'rb') as f:
+            raster = self._Raster(f)
+            try:
+                for y in range(self.height):
+                    start = self.offset + y * stride
+                    packed = bytearray(raster[start:start + stride])
+                    row = b''.join([_BYTE_BITS[v] for v in packed])
+                    row = row[:self.width]
+                    yield row.translate(_SWAP) if invert else row
+            finally:
+                raster.close()
+
+    def _GreyRows(self, threshold, invert):
+        depth = 2 if self.maxval > 255 else 1
+        stride = self.width * depth
+        # scale the threshold to the sample range; 16-bit samples are
+        # looked up by their most significant byte
+        threshold = threshold * self.maxval / 255
+        if depth == 2:
+            threshold = int(threshold) // 256
+        table = _ThresholdTable(threshold, invert)
+        with open(self.path, 'rb') as f:
+            raster = self._Raster(f)
+            try:
+                for y in range(self.height):
+                    start = self.offset + y * stride
+                    row = raster[start:start + stride]
+                    if depth == 2:
+                        row = row[0::2]  # the most significant bytes
+                    yield row.translate(table)
+            finally:
+                raster.close()
+
+    def _PlainRows(self, threshold, invert):
+        # ASCII formats have no fixed row size, so they are tokenised
+        with open(self.path, 'rb') as f:
+            data = f.read()[self.offset:]
+
+        data = re.sub(b'#[^\n]*', b'', data)
+
+        if self.magic == b'P1':
+            # plain PBM digits need not be separated, and 1 is black
+            values = re.findall(b'[01]', data)
+            for y in range(self.height):
+                row = b''.join(values[y * self.width:(y + 1) * self.width])
+                yield row.translate(_SWAP) if invert else row
+        else:
+            values = [int(v) for v in data.split()]
+            table = _ThresholdTable(threshold, invert)
+            for y in range(self.height):
+                grey = bytearray([v * 255 // self.maxval for v in
+                                  values[y * self.width:(y + 1) * self.width]])
+                yield bytes(grey).translate(table)
+
+
+class PNGImage(object):
+    """!
+    A PNG image, decompressed and unfiltered row by row
+    """
+
+    SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+    # samples per pixel for each supported colour type
+    CHANNELS = {0: 1, 2: 3, 4: 2, 6: 4}
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            if f.read(8) != self.SIGNATURE:
+                raise ValueError("Not a PNG image: %s" % path)
+            length, kind = struct.unpack('>I4s', f.read(8))
+            if kind != b'IHDR':
+                raise ValueError("Malformed PNG: %s" % path)
+            (self.width, self.height, depth, self.colour,
+             compression, filtering, interlace) = struct.unpack(
+                '>IIBBBBB', f.read(13))
+
+        if depth != 8 or self.colour not in self.CHANNELS:
+            raise ValueError("Only 8-bit grey, grey+alpha, RGB and RGBA "
+                             "PNG images are supported")
+        if interlace:
+            raise ValueError("Interlaced PNG images are not supported")
+
+        self.channels = self.CHANNELS[self.colour]
+
+    def _Chunks(self, f):
+        """!
+        Generate the compressed IDAT payloads in file order
+        """
+        f.seek(8)
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                return
+            length, kind = struct.unpack('>I4s', head)
+            if kind == b'IDAT':
+                yield f.read(length)
+                f.seek(4, 1)  # CRC
+            else:
+                f.seek(length + 4, 1)
+            if kind == b'IEND':
+                return
+
+    def _RawRows(self):
+        """!
+        Generate the unfiltered scanlines as bytearrays
+
+        The image data is inflated a bounded amount at a time, so only a
+        few rows are ever held decompressed, whatever the image size.
+        """
+        bpp = self.channels
+        stride = self.width * bpp
+        line = stride + 1
+        limit = max(16 * line, 65536)
+        prev = bytearray(stride)
+        pending = bytearray()
+        pos = 0
+        inflate = zlib.decompressobj()
+
+        with open(self.path, 'rb') as f:
+            chunks = self._Chunks(f)
+            for y in range(self.height):
+                if len(pending) - pos < line:
+                    # drop the rows already read once per refill, not
+                    # once per row
+                    del pending[:pos]
+                    pos = 0
+                    while len(pending) < line:
+                        data = inflate.unconsumed_tail
+                        if not data:
+                            try:
+                                data = next(chunks)
+                            except StopIteration:
+                                raise ValueError("Truncated PNG: %s" % self.path)
+                        pending += inflate.decompress(data, limit)
+
+                kind = pending[pos]
+                row = pending[pos + 1:pos + line]
+                pos += line
+
+                self._Unfilter(kind, row, prev, bpp)
+                yield row
+                prev = row
+
+    @staticmethod
+    def _Unfilter(kind, row, prev, bpp):
+        if kind == 1:  # Sub
+            for i in range(bpp, len(row)):
+                row[i] = (row[i] + row[i - bpp]) & 0xff
+        elif kind == 2:  # Up
+            for i in range(len(row)):
+                row[i] = (row[i] + prev[i]) & 0xff
+        elif kind == 3:  # Average
+            for i in range(len(row)):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xff
+        elif kind == 4:  # Paeth
+            for i in range(len(row)):
+                a = row[i - bpp] if i >= bpp else 0
+                b = prev[i]
+                c = prev[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    pred = a
+                elif pb <= pc:
+                    pred = b
+                else:
+                    pred = c
+                row[i] = (row[i] + pred) & 0xff
+        elif kind != 0:
+            raise ValueError("Bad PNG filter type %d" % kind)
+
+    def Rows(self, threshold=128, invert=False):
+        """!
+        Generate the thresholded rows, top to bottom. Transparent pixels
+        are composited over white.
+
+        @param threshold: grey level (0-256) below which a pixel is dark
+        @param invert: draw light pixels instead of dark ones
+        """
+        table = _ThresholdTable(threshold, invert)
+        bpp = self.channels
+
+        for raw in self._RawRows():
+            if self.colour == 0:
+                grey = raw
+            elif self.colour == 2:
+                grey = bytearray([(r * 299 + g * 587 + b * 114) // 1000
+                                  for r, g, b in zip(raw[0::3], raw[1::3],
+                                                     raw[2::3])])
+            else:
+                if self.colour == 4:
+                    grey = raw[0::2]
+                else:
+                    grey = [(r * 299 + g * 587 + b * 114) // 1000
+                            for r, g, b in zip(raw[0::4], raw[1::4],
+                                               raw[2::4])]
+                alpha = raw[bpp - 1::bpp]
+                grey = bytearray([(v * a + 255 * (255 - a)) // 255
+                                  for v, a in zip(grey, alpha)])
+
+            yield bytes(grey).translate(table)
+
+
+def OpenImage(path):
+    """!
+    Open a PBM, PGM or PNG image by looking at its signature
+
+    @return an image object with width, height and Rows()
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(8)
+
+    if magic == PNGImage.SIGNATURE:
+        return PNGImage(path)
+
+    return PNMImage(path)
+
+
+def RowRuns(row):
+    """!
+    The runs of drawn pixels in a thresholded row
+
+    @return list of (start, end) column pairs, end exclusive
+    """
+    return [m.span() for m in _RUN.finditer(row)]
+
+
+def MergedRectangles(rows):
+    """!
+    Merge runs that repeat on consecutive rows into rectangles.
+
+    Only the runs open on the current row are kept, so memory depends on
+    the image width, not its height.
+
+    @param rows: iterable of thresholded rows
+    @return generator of (x, y, w, h) rectangles in pixels
+    """
+    active = {}  # (start, end) -> first row
+    height = 0
+
+    for y, row in enumerate(rows):
+        height = y + 1
+        runs = set(RowRuns(row))
+
+        for run in sorted(active):
+            if run not in runs:
+                y0 = active.pop(run)
+                yield (run[0], y0, run[1] - run[0], y - y0)
+
+        for run in runs:
+            if run not in active:
+                active[run] = y
+
+    for run in sorted(active):
+        y0 = active[run]
+        yield (run[0], y0, run[1] - run[0], height - y0)
+
+
+def StaircasePolygons(rows):
+    """!
+    Trace chains of overlapping runs on consecutive rows into polygons.
+
+    A run joins the chain above it when the two runs overlap only each
+    other, so every chain is a simple polygon with a stepped left and
+    right edge. Branches and merges start new chains, and holes are
+    left as gaps between chains, since footprint polygons cannot carry
+    holes.
+
+    @param rows: iterable of thresholded rows
+    @return generator of polygon outlines as lists of (x, y) in pixels
+    """
+    chains = []  # open chains as [runs, first row], in run order
+
+    for y, row in enumerate(rows):
+        runs = RowRuns(row)
+
+        # overlap counts between the chains' last runs and the new runs
+        above = [0] * len(chains)
+        below = [0] * len(runs)
+        links = []
+        i = j = 0
+        while i < len(chains) and j < len(runs):
+            last = chains[i][0][-1]
+            if last[0] < runs[j][1] and runs[j][0] < last[1]:
+                above[i] += 1
+                below[j] += 1
+                links.append((i, j))
+            if last[1] < runs[j][1]:
+                i += 1
+            else:
+                j += 1
+
+        continued = {}
+        for i, j in links:
+            if above[i] == 1 and below[j] == 1:
+                continued[i] = j
+
+        new_chains = [None] * len(runs)
+        for i, chain in enumerate(chains):
+            if i in continued:
+                chain[0].append(runs[continued[i]])
+                new_chains[continued[i]] = chain
+            else:
+                yield _ChainOutline(chain)
+
+        for j, run in enumerate(runs):
+            if new_chains[j] is None:
+                new_chains[j] = [[run], y]
+
+        chains = new_chains
+
+    for chain in chains:
+        yield _ChainOutline(chain)
+
+
+def _ChainOutline(chain):
+    """!
+    Outline of a chain of runs: down the left edges, up the right ones,
+    without collinear vertices
+    """
+    runs, y0 = chain
+    left = []
+    right = []
+
+    for k, (start, end) in enumerate(runs):
+        y = y0 + k
+        if not left or left[-1][0] != start:
+            left += [(start, y), (start, y + 1)]
+        else:
+            left[-1] = (start, y + 1)
+        if not right or right[-1][0] != end:
+            right += [(end, y), (end, y + 1)]
+        else:
+            right[-1] = (end, y + 1)
+
+    return left + right[::-1]
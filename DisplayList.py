@@ -0,0 +1,212 @@
+#  DisplayList.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+
+from __future__ import division
+
+from array import array
+
+
+class DisplayList(object):
+    """!
+    A compact record of footprint graphics, independent of pcbnew.
+
+    Each record is an operation with its layer, line width, an angle
+    (for arcs) and a run of already transformed (x, y) co-ordinates:
+
+        SEGMENT: start, end
+        CIRCLE:  centre, a point on the circle
+        ARC:     centre, start; the angle is in deci-degrees
+        POLYGON: the vertices of a filled, implicitly closed, polygon
+
+    The records are held column-wise in typed arrays rather than as
+    Python objects, so even large graphics take little memory. The
+    drawing aids record into a display list and flush it to the module;
+    anything else can read the records back with Record() or iteration.
+    """
+
+    SEGMENT = 0
+    CIRCLE = 1
+    ARC = 2
+    POLYGON = 3
+
+    def __init__(self):
+        self.Clear()
+
+    def Clear(self):
+        """!
+        Remove all the records
+        """
+        self.ops = array('B')
+        self.layers = array('i')
+        self.widths = array('l')
+        self.angles = array('d')
+        # record i has the co-ordinates coords[starts[i]:starts[i + 1]]
+        self.starts = array('L', [0])
+        self.coords = array('d')
+
+    def __len__(self):
+        return len(self.ops)
+
+    def Append(self, op, layer, width, pts, angle=0):
+        """!
+        Add a record
+
+        @param op: one of SEGMENT, CIRCLE, ARC or POLYGON
+        @param layer: the layer
+        @param width: the line width
+        @param pts: the transformed points, a sequence of (x, y)
+        @param angle: the arc angle in deci-degrees
+        """
+        coords = self.coords
+        for x, y in pts:
+            coords.append(x)
+            coords.append(y)
+
+        self.ops.append(op)
+        self.layers.append(layer)
+        self.widths.append(int(width))
+        self.angles.append(angle)
+        self.starts.append(len(coords))
+
+    def Points(self, i):
+        """!
+        The points of record i, as a list of (x, y)
+        """
+        c = self.coords[self.starts[i]:self.starts[i + 1]]
+        return list(zip(c[0::2], c[1::2]))
+
+    def Record(self, i):
+        """!
+        Record i, as (op, layer, width, points, angle)
+        """
+        return (self.ops[i], self.layers[i], self.widths[i],
+                self.Points(i), self.angles[i])
+
+    def __iter__(self):
+        for i in range(len(self.ops)):
+            yield self.Record(i)
+
+    def Groups(self):
+        """!
+        The records grouped by layer and line width
+
+        The groups are sorted by layer then width, and each group keeps
+        its records in the order they were made, so a drawing always
+        comes out in the same order however its layers were interleaved.
+
+        @return list of ((layer, width), [record index, ...])
+        """
+        groups = {}
+        for i, key in enumerate(zip(self.layers, self.widths)):
+            groups.setdefault(key, []).append(i)
+
+        return sorted(groups.items())
+
+    def _Rounded(self, i):
+        """!
+        Record i with the co-ordinates rounded to whole units, and a
+        hashable key for it
+
+        @return (key, record)
+        """
+        pts = tuple((int(round(x)), int(round(y))) for x, y in self.Points(i))
+        record = (self.ops[i], self.layers[i], self.widths[i], pts,
+                  self.angles[i])
+
+        # a segment is the same whichever way round it is drawn
+        if self.ops[i] == self.SEGMENT and pts[1] < pts[0]:
+            return record[:3] + ((pts[1], pts[0]),) + record[4:], record
+
+        return record, record
+
+    def Optimize(self):
+        """!
+        Remove duplicate records, and merge chains of collinear segments
+        of the same layer and width into single segments.
+
+        Segments are merged where they meet end to end at a point that
+        no other segment of the layer and width touches. Endpoints are
+        found through a hash index, so the pass is linear in the number
+        of records. The first record of each merged chain keeps its
+        place in the list.
+
+        @return the number of records removed
+        """
+        count = len(self)
+
+        # drop exact duplicates
+        records = []
+        seen = set()
+        for i in range(count):
+            key, record = self._Rounded(i)
+            if key not in seen:
+                seen.add(key)
+                records.append(record)
+
+        # index the segment endpoints
+        ends = {}
+        for n, (op, layer, width, pts, angle) in enumerate(records):
+            if op == self.SEGMENT and pts[0] != pts[1]:
+                for p in pts:
+                    ends.setdefault((layer, width, p), []).append(n)
+
+        def _Through(n, p):
+            # the segment continuing segment n straight on through p
+            layer, width = records[n][1:3]
+            touching = ends.get((layer, width, p), ())
+            if len(touching) != 2:
+                return None
+
+            m = touching[0] if touching[1] == n else touching[1]
+            ux, uy = _Other(n, p)
+            vx, vy = _Other(m, p)
+            ux, uy, vx, vy = ux - p[0], uy - p[1], vx - p[0], vy - p[1]
+
+            # collinear, and on opposite sides of p
+            if ux * vy - uy * vx == 0 and ux * vx + uy * vy < 0:
+                return m
+            return None
+
+        def _Other(n, p):
+            a, b = records[n][3]
+            return b if a == p else a
+
+        def _Walk(n, p, merged):
+            # follow the chain from segment n out through its end p
+            while True:
+                m = _Through(n, p)
+                if m is None or m in merged:
+                    return p
+                merged.add(m)
+                n, p = m, _Other(m, p)
+
+        merged = set()
+        output = []
+        for n, (op, layer, width, pts, angle) in enumerate(records):
+            if n in merged:
+                continue
+            if op == self.SEGMENT and n in ends.get((layer, width, pts[0]), ()):
+                merged.add(n)
+                pts = (_Walk(n, pts[0], merged), _Walk(n, pts[1], merged))
+            output.append((op, layer, width, pts, angle))
+
+        self.Clear()
+        for op, layer, width, pts, angle in output:
+            self.Append(op, layer, width, pts, angle)
+
+        return count - len(self)
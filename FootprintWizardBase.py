@@ -16,8 +16,13 @@
 
 from __future__ import division
 import pcbnew
+import collections
 import math
 
+import AffineTransform
+import DisplayList
+import SpatialIndex
+
 
 class FootprintWizard(pcbnew.FootprintWizardPlugin):
     """!
@@ -49,6 +54,27 @@ class FootprintWizard(pcbnew.FootprintWizardPlugin):
     uPercent = pcbnew.uPercent
     uString = pcbnew.uString
 
+    # record the footprint graphics into a display list while building,
+    # and add them to the module in one go at the end
+    recordGraphics = False
+
+    # when recording, also remove duplicate graphics and merge collinear
+    # segments before adding them to the module
+    optimizeGraphics = False
+
+    # when recording, cut the silkscreen back from the pads by the
+    # silkClearance, instead of working out where to stop in each wizard;
+    # cut pieces shorter than silkMinLength, or the line width if that is
+    # longer, are dropped rather than left as slivers between the pads
+    clipSilkscreen = False
+    silkMinLength = pcbnew.FromMM(0.2)
+
+    # check the clearances between the pads, and between the pads and
+    # the silkscreen, of the built footprint
+    checkClearances = False
+    padClearance = pcbnew.FromMM(0.2)
+    silkClearance = pcbnew.FromMM(0.15)
+
     def __init__(self):
         pcbnew.FootprintWizardPlugin.__init__(self)
         self.GenerateParameterList()
@@ -146,10 +172,88 @@ class FootprintWizard(pcbnew.FootprintWizardPlugin):
         self.module.Reference().SetThickness(thick)
         self.module.Value().SetThickness(thick)
 
+        if self.recordGraphics:
+            self.draw.BeginRecording()
+
         self.BuildThisFootprint()  # implementer's build function
 
+        if self.recordGraphics:
+            if self.clipSilkscreen:
+                self.draw.ClipRecording(self.silkClearance,
+                                        minLength=self.silkMinLength)
+            if self.optimizeGraphics:
+                self.draw.OptimizeRecording()
+            self.draw.EndRecording()
+
+        if self.checkClearances:
+            self.CheckClearances()
+
         return
 
+    def CheckClearances(self):
+        """!
+        Check that the copper pads keep padClearance from each other and
+        silkClearance from the silkscreen segments on their side, and
+        report the violations in the build messages.
+
+        Pads with the same name are connected, and are not checked
+        against each other. The pads go into a grid index, so only
+        neighbouring pads are compared. Shortfalls of under one unit are
+        only the rounding of the co-ordinates, and are not reported.
+
+        @return list of (pad name, other pad name or None for the
+                silkscreen, distance), also kept as clearanceViolations
+        """
+        index = self.draw.PadIndex(self.padClearance)
+        violations = []
+
+        if index is not None:
+            for a, b in index.Pairs(self.padClearance):
+                if a[0] and a[0] == b[0]:
+                    continue
+                if not (a[1][0] and b[1][0] or a[1][1] and b[1][1]):
+                    continue
+
+                d = SpatialIndex.BoxDistance(a[2], b[2]) - a[3] - b[3]
+                if d <= self.padClearance - 1:
+                    violations.append((a[0], b[0], d))
+
+            silk = {pcbnew.F_SilkS: 0, pcbnew.B_SilkS: 1}
+            for item in self.module.GraphicalItems():
+                side = silk.get(item.GetLayer())
+                if side is None or item.GetShape() != pcbnew.S_SEGMENT:
+                    continue
+
+                start, end = item.GetStart(), item.GetEnd()
+                seg = (start.x, start.y, end.x, end.y)
+                w = item.GetWidth() / 2
+                box = (min(seg[0], seg[2]) - w, min(seg[1], seg[3]) - w,
+                       max(seg[0], seg[2]) + w, max(seg[1], seg[3]) + w)
+
+                for pad in index.Query(box, self.silkClearance):
+                    if not pad[1][side]:
+                        continue
+                    d = SpatialIndex.SegmentBoxDistance(seg, pad[2]) - pad[3] - w
+                    if d <= self.silkClearance - 1:
+                        violations.append((pad[0], None, d))
+
+        self.clearanceViolations = violations
+
+        if violations:
+            self.buildmessages += "Clearance check: {n} violations\n".format(
+                n=len(violations))
+            for a, b, d in violations[:20]:
+                what = "pads {a} and {b}".format(a=a, b=b) if b is not None \
+                    else "pad {a} and silkscreen".format(a=a)
+                self.buildmessages += "\t{w}: {d:.3f}mm\n".format(
+                    w=what, d=pcbnew.ToMM(d))
+            if len(violations) > 20:
+                self.buildmessages += "\t...\n"
+        else:
+            self.buildmessages += "Clearance check: no violations\n"
+
+        return violations
+
     def SetModule3DModel(self):
         """!
         If your plug-in sets a 3D model, override this function
@@ -199,11 +303,26 @@ class FootprintWizardDrawingAids:
     flipY = 2  # flip Y values, i.e. about the X-axis
     flipBoth = 3  # flip X and Y values, equivalent to a 180-degree rotation
 
-    xfrmIDENTITY = [1, 0, 0, 0, 1, 0]  # no transform
+    xfrmIDENTITY = AffineTransform.Affine.IDENTITY  # no transform
+
+    _flips = {
+        flipNone: AffineTransform.Affine.IDENTITY,
+        flipX: AffineTransform.Affine.FLIP_X,
+        flipY: AffineTransform.Affine.FLIP_Y,
+        flipBoth: AffineTransform.Affine.FLIP_BOTH,
+    }
 
     # these values come from our KiCad Library Convention 0.11
     defaultLineThickness = pcbnew.FromMM(0.15)
 
+    # arcs are split into chords no further than this from the true arc
+    defaultArcTolerance = pcbnew.FromMM(0.01)
+
+    # tessellated arcs, shared by all the drawing aids and kept in least
+    # recently used order, see _ArcTessellation()
+    arcCacheSize = 256
+    _arcCache = collections.OrderedDict()
+
     def DefaultGraphicLayer(self):
         return pcbnew.F_SilkS
 
@@ -217,17 +336,34 @@ class FootprintWizardDrawingAids:
             'layer': self.DefaultGraphicLayer(),
             'lineThickness': self.defaultLineThickness,
             'transforms': [],
-            'transform': self.xfrmIDENTITY
+            'transform': self.xfrmIDENTITY,
+            'tessellateArcs': False,
+            'arcTolerance': self.defaultArcTolerance
         }
+        # graphics are added to the module straight away unless a
+        # display list is being recorded
+        self.displayList = None
+        # running bounding box of the graphics on each layer, as
+        # [left, top, right, bottom] in module co-ordinates
+        self.extents = {}
+        # running bounding box of the pads placed by pad arrays, see
+        # IncludePad()
+        self.padExtents = None
+        # grids the co-ordinates are put on as they go into the module,
+        # see SetSnapGrid()
+        self.snapGrids = {}
+        self.snapGrid = 1
+        self.padSnapGrid = 1
 
     def PushTransform(self, mat):
         """!
         Add a transform to the top of the stack and recompute the
         overall transform
 
-        @param mat: the transform matrix to add to the stack
+        @param mat: the transform matrix to add to the stack, an Affine
+                    or a sequence of six elements
         """
-        self.dc['transforms'].append(mat)
+        self.dc['transforms'].append(AffineTransform.Affine.From(mat))
         self.RecomputeTransforms()
 
     def PopTransform(self, num=1):
@@ -264,13 +400,7 @@ class FootprintWizardDrawingAids:
 
         for mat in mats:
             # Pre-compose with each transform in turn
-            x = [
-                x[0] * mat[0] + x[1] * mat[3],
-                x[0] * mat[1] + x[1] * mat[4],
-                x[0] * mat[2] + x[1] * mat[5] + x[2],
-                x[3] * mat[0] + x[4] * mat[3],
-                x[3] * mat[1] + x[4] * mat[4],
-                x[3] * mat[2] + x[4] * mat[5] + x[5]]
+            x = x * mat
 
         return x
 
@@ -295,7 +425,7 @@ class FootprintWizardDrawingAids:
         @param push: add this transform to the current stack
         @return the generated transform matrix
         """
-        mat = [1, 0, x, 0, 1, y]
+        mat = AffineTransform.Affine.Translation(x, y)
 
         if push:
             self.PushTransform(mat)
@@ -310,17 +440,10 @@ class FootprintWizardDrawingAids:
         @param push: add this transform to the current stack
         @return the generated transform matrix
         """
-        mat = None
-        if flip == self.flipX:
-            mat = [-1, 0, 0, 0, 1, 0]
-        elif flip == self.flipY:
-            mat = [1, 0, 0, 0, -1, 0]
-        elif flip == self.flipBoth:
-            mat = [-1, 0, 0, 0, -1, 0]
-        elif flip == self.flipNone:
-            mat = self.xfrmIDENTITY
-        else:
-            raise ValueError
+        try:
+            mat = self._flips[flip]
+        except KeyError:
+            raise ValueError("Unknown flip: %r" % (flip,))
 
         if push:
             self.PushTransform(mat)
@@ -332,7 +455,7 @@ class FootprintWizardDrawingAids:
         vertical or both flip about a point (x,y)
 
         This is performed by a translate-to-origin, flip, translate-
-        back sequence.
+        back sequence, fused into a single matrix.
 
         @param x: the x co-ordinate of the flip point
         @param y: the y co-ordinate of the flip point
@@ -340,12 +463,7 @@ class FootprintWizardDrawingAids:
         @param push: add this transform to the current stack
         @return the generated transform matrix
         """
-        mats = [self.TransformTranslate(x, y, push=False),
-                self.TransformFlipOrigin(flip, push=False),
-                self.TransformTranslate(-x, -y, push=False)]
-
-        # Distil into a single matrix
-        mat = self._ComposeMatricesWithIdentity(mats)
+        mat = self.TransformFlipOrigin(flip, push=False).About(x, y)
 
         if push:
             self.PushTransform(mat)
@@ -363,9 +481,7 @@ class FootprintWizardDrawingAids:
         @param push: add this transform to the current stack
         @return the generated transform matrix
         """
-        rads = rot * math.pi / 180
-        mat = [math.cos(rads), -math.sin(rads), 0,
-               math.sin(rads), math.cos(rads), 0]
+        mat = AffineTransform.Affine.Rotation(rot)
 
         if push:
             self.PushTransform(mat)
@@ -377,7 +493,7 @@ class FootprintWizardDrawingAids:
         about the point (x,y), and optionally push onto the stack
 
         This is performed by a translate-to-origin, rotate, translate-
-        back sequence
+        back sequence, fused into a single matrix
 
         @param x: the x co-ordinate of the rotation centre
         @param y: the y co-ordinate of the rotation centre
@@ -386,12 +502,7 @@ class FootprintWizardDrawingAids:
         @return the generated transform matrix
         """
 
-        mats = [self.TransformTranslate(x, y, push=False),
-                self.TransformRotationOrigin(rot, push=False),
-                self.TransformTranslate(-x, -y, push=False)]
-
-        # Distil into a single matrix
-        mat = self._ComposeMatricesWithIdentity(mats)
+        mat = self.TransformRotationOrigin(rot, push=False).About(x, y)
 
         if push:
             self.PushTransform(mat)
@@ -411,10 +522,7 @@ class FootprintWizardDrawingAids:
         @return the generated transform matrix
         """
 
-        if sy is None:
-            sy = sx
-
-        mat = [sx, 0, 0, 0, sy, 0]
+        mat = AffineTransform.Affine.Scale(sx, sy)
 
         if push:
             self.PushTransform(mat)
@@ -431,11 +539,17 @@ class FootprintWizardDrawingAids:
         @return: the transformed point as a wxPoint
         """
 
-        if not mat:
-            mat = self.dc['transform']
+        return pcbnew.wxPoint(*self._Transform(x, y, mat))
 
-        return pcbnew.wxPoint(x * mat[0] + y * mat[1] + mat[2],
-                              x * mat[3] + y * mat[4] + mat[5])
+    def _Transform(self, x, y, mat=None):
+        """!
+        As TransformPoint(), but return the point as an (x, y) tuple
+        """
+
+        if mat is None:
+            return self.dc['transform'].Apply(x, y)
+
+        return AffineTransform.Affine.From(mat).Apply(x, y)
 
     def SetLineThickness(self, lineThickness):
         """!
@@ -477,24 +591,607 @@ class FootprintWizardDrawingAids:
         """
         return self.dc['layer']
 
+    def SetArcTessellation(self, tessellate, tolerance=None):
+        """!
+        Choose how subsequent arcs and circles are drawn
+
+        Tessellated arcs and circles are drawn as runs of segments, and
+        filled circles as polygons rather than thick rings. Arcs and
+        circles are always tessellated when the current transform does
+        not keep them circular (e.g. a horizontal scale).
+
+        @param tessellate: True to always tessellate
+        @param tolerance: the largest distance from the chords to the true
+                          arc, or None to keep the current one
+        """
+        self.dc['tessellateArcs'] = tessellate
+
+        if tolerance is not None:
+            if tolerance <= 0:
+                raise ValueError("Arc tolerance must be positive")
+            self.dc['arcTolerance'] = tolerance
+
+    def GetArcTessellation(self):
+        """!
+        Return whether arcs and circles are always tessellated, and the
+        tolerance, as (tessellate, tolerance)
+        """
+        return self.dc['tessellateArcs'], self.dc['arcTolerance']
+
+    def _Tessellated(self):
+        """!
+        Whether arcs and circles drawn now need tessellating
+        """
+        return (self.dc['tessellateArcs'] or
+                not self.dc['transform'].is_similarity)
+
+    @classmethod
+    def _ArcTessellation(cls, r, angle, tolerance):
+        """!
+        Points along an arc of radius r centred on the origin and starting
+        at (r, 0), close enough that the chords stay within the tolerance
+
+        The points depend only on the radius, to the nearest unit, the
+        angle and the tolerance, so they are cached and any arc of the
+        same size is mapped from them, see _ArcPoints().
+
+        @param r: the arc radius
+        @param angle: the arc angle in deci-degrees, clockwise on screen
+        @param tolerance: the largest distance from the chords to the arc
+        @return tuple of (x, y)
+        """
+        r = int(round(r))
+        key = (r, angle, tolerance)
+
+        # OrderedDict.move_to_end() is Python 3 only
+        cache = cls._arcCache
+        pts = cache.pop(key, None)
+
+        if pts is None:
+            sweep = math.radians(angle / 10)
+            if r > 0:
+                step = 2 * math.acos(max(-1, 1 - tolerance / r))
+            else:
+                step = math.pi
+            # never fewer than eight chords to a circle
+            step = min(step, math.pi / 4)
+            n = max(1, int(math.ceil(abs(sweep) / step)))
+
+            pts = tuple((r * math.cos(sweep * i / n), r * math.sin(sweep * i / n))
+                        for i in range(n + 1))
+
+            while len(cache) >= cls.arcCacheSize:
+                cache.popitem(last=False)
+
+        cache[key] = pts
+        return pts
+
+    def _ArcPoints(self, centre, start, angle, mat=None, tolerance=None):
+        """!
+        Points along an arc, close enough that the chords stay within the
+        tolerance of the arc, then transformed
+
+        The cached points of _ArcTessellation() are rotated to the start,
+        moved to the centre and transformed in one affine mapping.
+
+        @param centre: the arc centre, as (x, y)
+        @param start: the arc start, as (x, y)
+        @param angle: the arc angle in deci-degrees, clockwise on screen
+        @param mat: the transform matrix to apply, or None for none
+        @param tolerance: the tolerance, or None to use the DC's
+        @return list of (x, y)
+        """
+        if tolerance is None:
+            tolerance = self.dc['arcTolerance']
+        if mat is None:
+            mat = self.xfrmIDENTITY
+
+        (cx, cy), (sx, sy) = centre, start
+        dx, dy = sx - cx, sy - cy
+        r = math.hypot(dx, dy)
+        c, s = (dx / r, dy / r) if r > 0 else (1, 0)
+
+        mat = (AffineTransform.Affine.From(mat) *
+               AffineTransform.Affine(c, -s, cx, s, c, cy))
+
+        return mat.ApplyAll(self._ArcTessellation(r, angle, tolerance))
+
+    def SetSnapGrid(self, grid, layers=None):
+        """!
+        Set the grid the co-ordinates of graphics and text are put on
+
+        Co-ordinates are snapped as the items go into the module, so
+        recorded graphics are snapped when they are flushed, a layer at a
+        time. Line widths are only rounded to whole units.
+
+        @param grid: the grid, in internal units; 1 (the default) rounds
+                     to whole nanometres
+        @param layers: sequence of layers to use the grid on, or None to
+                       use it on every layer without a grid of its own
+        """
+        if grid < 1:
+            raise ValueError("Snap grid must be at least one unit")
+
+        if layers is None:
+            self.snapGrid = grid
+        else:
+            for layer in layers:
+                self.snapGrids[layer] = grid
+
+    def GetSnapGrid(self, layer):
+        """!
+        Return the grid co-ordinates on the layer are put on
+        """
+        return self.snapGrids.get(layer, self.snapGrid)
+
+    def SetPadSnapGrid(self, grid):
+        """!
+        Set the grid the pad array positions are put on, see PadPosition()
+
+        @param grid: the grid, in internal units; 1 (the default) rounds
+                     to whole nanometres
+        """
+        if grid < 1:
+            raise ValueError("Snap grid must be at least one unit")
+
+        self.padSnapGrid = grid
+
+    @staticmethod
+    def _SnapPoints(pts, grid):
+        """!
+        Points put on a grid, as a list of integer (x, y)
+        """
+        if grid == 1:
+            return [(int(round(x)), int(round(y))) for x, y in pts]
+
+        return [(int(round(round(x / grid) * grid)),
+                 int(round(round(y / grid) * grid))) for x, y in pts]
+
+    def PadPosition(self, x, y):
+        """!
+        Return the position of a pad at (x, y): transformed by the drawing
+        context transform and put on the pad grid, as a wxPoint
+        """
+        point = self._SnapPoints([self.dc['transform'].Apply(x, y)],
+                                 self.padSnapGrid)[0]
+        return pcbnew.wxPoint(*point)
+
+    def PadSizeWithin(self, pos, left, top, right, bottom):
+        """!
+        Return the largest whole unit size of a pad centred on pos, a
+        position from PadPosition(), that stays within a box: the box is
+        transformed by the drawing context transform, but not put on the
+        pad grid, so the pad keeps inside it however far the grid moved
+        its centre
+
+        @return the size, as a wxSize
+        """
+        (x0, y0), (x1, y1) = self.dc['transform'].ApplyAll(
+            [(left, top), (right, bottom)])
+
+        # the tolerance keeps rounding errors from costing a unit
+        w = 2 * min(abs(pos.x - x0), abs(x1 - pos.x)) + 1e-6
+        h = 2 * min(abs(pos.y - y0), abs(y1 - pos.y)) + 1e-6
+        return pcbnew.wxSize(int(w), int(h))
+
+    def BeginRecording(self, displayList=None):
+        """!
+        Record the graphics drawn from now on into a display list,
+        rather than adding them to the module, until EndRecording()
+
+        @param displayList: the display list to record into, or None
+                            for a new one
+        @return the display list
+        """
+        if displayList is None:
+            displayList = DisplayList.DisplayList()
+
+        self.displayList = displayList
+        return displayList
+
+    def Flush(self):
+        """!
+        Add the graphics recorded so far to the module, and clear the
+        display list
+
+        The graphics are added a layer and line width at a time, see
+        DisplayList.Groups(), so the order of the module's graphics does
+        not depend on how often the wizard switched layers.
+        """
+        if self.displayList is None:
+            return
+
+        displayList = self.displayList
+        for (layer, width), group in displayList.Groups():
+            self._AddGraphics(layer, width,
+                              [(displayList.ops[i], displayList.Points(i),
+                                displayList.angles[i]) for i in group])
+
+        self.displayList.Clear()
+
+    def OptimizeRecording(self):
+        """!
+        Remove duplicates and merge collinear segments in the graphics
+        recorded so far, see DisplayList.Optimize()
+
+        @return the number of graphic items saved
+        """
+        if self.displayList is None:
+            return 0
+
+        return self.displayList.Optimize()
+
+    def ClipRecording(self, clearance,
+                      layers=(pcbnew.F_SilkS, pcbnew.B_SilkS), minLength=0):
+        """!
+        Cut the graphics recorded on the silkscreen layers where they come
+        within the clearance of a copper pad on their side of the board,
+        keeping the pieces outside
+
+        Segments are cut exactly against the pad shapes, see PadGeometry().
+        Arcs and circles that come near a pad are first split into short
+        segments, see _ArcPoints(). Filled polygons are left as they are.
+        The pads are found through a spatial index, so each graphic is
+        only tested against the pads around it.
+
+        The cuts are made one snap grid step (see SetSnapGrid()) beyond
+        the clearance, so the cut ends still keep the clearance once they
+        are put on the grid. Pieces left shorter than minLength, or than
+        their line width if that is longer, are dropped: with an outline
+        drawn across a row of pads they would be slivers in the gaps.
+
+        @param clearance: the silkscreen to pad clearance
+        @param layers: the silkscreen layers, front then back
+        @param minLength: the shortest cut piece to keep
+        """
+        index = self.PadIndex(clearance)
+        if self.displayList is None or index is None:
+            return
+
+        sides = dict((layer, side) for side, layer in enumerate(layers))
+        SEGMENT = DisplayList.DisplayList.SEGMENT
+
+        records = list(self.displayList)
+        self.displayList.Clear()
+
+        for op, layer, width, pts, angle in records:
+            side = sides.get(layer)
+            if side is None or op == DisplayList.DisplayList.POLYGON:
+                self.displayList.Append(op, layer, width, pts, angle)
+                continue
+
+            margin = clearance + self.GetSnapGrid(layer)
+
+            if op != SEGMENT:
+                (cx, cy), (sx, sy) = pts
+                r = math.hypot(sx - cx, sy - cy)
+                box = (cx - r, cy - r, cx + r, cy + r)
+                if not [pad for pad in index.Query(box, margin + width / 2)
+                        if pad[1][side]]:
+                    self.displayList.Append(op, layer, width, pts, angle)
+                    continue
+                if op == DisplayList.DisplayList.CIRCLE:
+                    angle = 3600
+                pts = self._ArcPoints(pts[0], pts[1], angle)
+            for start, end in zip(pts, pts[1:]):
+                for piece in self._ClipSegment(index, side, margin, width,
+                                               start, end,
+                                               max(minLength, width, 1)):
+                    self.displayList.Append(SEGMENT, layer, width, piece)
+
+    def _ClipSegment(self, index, side, clearance, width, start, end,
+                     minLength=1):
+        """!
+        The pieces of a segment that keep the clearance from the pads
+
+        A segment that is not cut is kept whatever its length; the pieces
+        of one that is are only kept from minLength up.
+
+        @return list of [start, end] pieces
+        """
+        w = width / 2
+        seg = start + end
+        box = (min(seg[0], seg[2]), min(seg[1], seg[3]),
+               max(seg[0], seg[2]), max(seg[1], seg[3]))
+
+        cuts = []
+        for name, sides, core, r in index.Query(box, clearance + w):
+            if sides[side]:
+                cut = SpatialIndex.SegmentRoundedBoxInterval(
+                    seg, core, r + clearance + w)
+                if cut is not None:
+                    cuts.append(cut)
+
+        if not cuts:
+            return [[start, end]]
+
+        # the parts of [0, 1] left between the cuts
+        pieces = []
+        t = 0
+        for t0, t1 in sorted(cuts):
+            if t0 > t:
+                pieces.append((t, t0))
+            t = max(t, t1)
+        if t < 1:
+            pieces.append((t, 1))
+
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length = math.hypot(dx, dy)
+
+        return [[(start[0] + t0 * dx, start[1] + t0 * dy),
+                 (start[0] + t1 * dx, start[1] + t1 * dy)]
+                for t0, t1 in pieces if (t1 - t0) * length >= minLength]
+
+    def EndRecording(self):
+        """!
+        Flush the display list and go back to adding graphics to the
+        module straight away
+
+        @return the display list
+        """
+        displayList = self.displayList
+        self.Flush()
+        self.displayList = None
+        return displayList
+
+    def _Emit(self, op, width, pts, angle=0):
+        """!
+        Record a graphic item on the current layer, or add it to the
+        module if there is no display list
+
+        @param op: DisplayList operation
+        @param width: the line width
+        @param pts: the transformed points, see DisplayList
+        @param angle: the arc angle in deci-degrees
+        """
+        layer = self.dc['layer']
+
+        if self.displayList is not None:
+            self.displayList.Append(op, layer, width, pts, angle)
+        else:
+            self._AddGraphics(layer, width, [(op, pts, angle)])
+
+        self._IncludeGraphic(op, layer, width, pts)
+
+    def _IncludeGraphic(self, op, layer, width, pts):
+        """!
+        Grow the bounding box of the layer to take in a graphic item,
+        given as a display list record
+        """
+        if op in (DisplayList.DisplayList.CIRCLE, DisplayList.DisplayList.ARC):
+            # the whole circle: a safe bound for an arc
+            (cx, cy), (sx, sy) = pts[0], pts[1]
+            r = math.hypot(sx - cx, sy - cy) + width / 2
+            x0, y0, x1, y1 = cx - r, cy - r, cx + r, cy + r
+        else:
+            w = width / 2
+            xs = [x for x, y in pts]
+            ys = [y for x, y in pts]
+            x0, y0, x1, y1 = min(xs) - w, min(ys) - w, max(xs) + w, max(ys) + w
+
+        box = self.extents.get(layer)
+        if box is None:
+            self.extents[layer] = [x0, y0, x1, y1]
+        else:
+            box[0] = min(box[0], x0)
+            box[1] = min(box[1], y0)
+            box[2] = max(box[2], x1)
+            box[3] = max(box[3], y1)
+
+    def GetExtents(self, layers):
+        """!
+        The bounding box of the graphics drawn so far on the given layers
+
+        @param layers: sequence of layers
+        @return (left, top, right, bottom), or None if nothing was drawn
+        """
+        boxes = [self.extents[l] for l in layers if l in self.extents]
+        if not boxes:
+            return None
+
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+    def IncludePad(self, pad):
+        """!
+        Grow the bounding box of the pads to take in a pad
+
+        Pad arrays call this for every pad they add, see
+        PadArray.AddPadsToModule(); wizards adding pads to the module
+        themselves call it for those.
+
+        @param pad: the pad, at its final position
+        """
+        bb = pad.GetBoundingBox()
+        x0, y0, x1, y1 = bb.GetX(), bb.GetY(), bb.GetRight(), bb.GetBottom()
+
+        box = self.padExtents
+        if box is None:
+            self.padExtents = [x0, y0, x1, y1]
+        else:
+            box[0] = min(box[0], x0)
+            box[1] = min(box[1], y0)
+            box[2] = max(box[2], x1)
+            box[3] = max(box[3], y1)
+
+    def GetPadExtents(self):
+        """!
+        The bounding box of the pads added so far, see IncludePad()
+
+        @return (left, top, right, bottom), or None if there are no pads
+        """
+        box = self.padExtents
+        return tuple(box) if box else None
+
+    def PadGeometry(self, pad):
+        """!
+        A pad as a core box grown by a radius: exact for round, oval,
+        rectangular and rounded rectangle pads at multiples of 90
+        degrees, the bounding box for anything else
+
+        @return ((left, top, right, bottom), radius)
+        """
+        shape = pad.GetShape()
+        orientation = pad.GetOrientation()
+
+        if orientation % 900 == 0 and shape in (
+                pcbnew.PAD_SHAPE_CIRCLE, pcbnew.PAD_SHAPE_OVAL,
+                pcbnew.PAD_SHAPE_RECT, pcbnew.PAD_SHAPE_ROUNDRECT):
+            pos = pad.GetPosition()
+            size = pad.GetSize()
+            w, h = size.x, size.y
+            if (orientation // 900) % 2:
+                w, h = h, w
+
+            if shape in (pcbnew.PAD_SHAPE_CIRCLE, pcbnew.PAD_SHAPE_OVAL):
+                r = min(w, h) / 2
+            elif shape == pcbnew.PAD_SHAPE_ROUNDRECT:
+                r = pad.GetRoundRectCornerRadius()
+            else:
+                r = 0
+
+            return ((pos.x - w / 2 + r, pos.y - h / 2 + r,
+                     pos.x + w / 2 - r, pos.y + h / 2 - r), r)
+
+        bb = pad.GetBoundingBox()
+        return (bb.GetX(), bb.GetY(), bb.GetRight(), bb.GetBottom()), 0
+
+    def PadIndex(self, margin=0):
+        """!
+        A spatial index of the module's copper pads, see PadGeometry()
+
+        @param margin: the largest distance the index will be searched to,
+                       used to size the grid cells
+        @return a SpatialIndex of (name, (on F.Cu, on B.Cu), core box,
+                radius) items, or None if there are no copper pads
+        """
+        pads = []
+        for pad in self.module.Pads():
+            sides = (pad.IsOnLayer(pcbnew.F_Cu), pad.IsOnLayer(pcbnew.B_Cu))
+            if any(sides):
+                pads.append((pad.GetName(), sides) + self.PadGeometry(pad))
+
+        if not pads:
+            return None
+
+        sizes = [max(b[2] - b[0], b[3] - b[1]) + 2 * r
+                 for name, sides, b, r in pads]
+        index = SpatialIndex.SpatialIndex(
+            max(sum(sizes) / len(sizes) + margin, 1))
+
+        for pad in pads:
+            b, r = pad[2], pad[3]
+            index.Insert(pad, (b[0] - r, b[1] - r, b[2] + r, b[3] + r))
+
+        return index
+
+    def AutoCourtyard(self, margin, grid=pcbnew.FromMM(0.1),
+                      layers=(pcbnew.F_Fab,)):
+        """!
+        Draw a rectangular courtyard around the pads (see GetPadExtents())
+        and the body: the graphics drawn so far on the given layers. The rectangle is
+        grown by the margin, then out to the grid.
+
+        The courtyard is drawn on F.CrtYd with the KLC line thickness;
+        the drawing layer is left unchanged.
+
+        @param margin: the courtyard clearance
+        @param grid: the grid of the courtyard corners
+        @param layers: the layers of the body outline
+        @return the courtyard as (left, top, right, bottom), or None if
+                there is nothing to enclose
+        """
+        boxes = [b for b in (self.GetPadExtents(), self.GetExtents(layers))
+                 if b is not None]
+        if not boxes:
+            return None
+
+        g = grid
+        x0 = int(math.floor((min(b[0] for b in boxes) - margin) / g)) * g
+        y0 = int(math.floor((min(b[1] for b in boxes) - margin) / g)) * g
+        x1 = int(math.ceil((max(b[2] for b in boxes) + margin) / g)) * g
+        y1 = int(math.ceil((max(b[3] for b in boxes) + margin) / g)) * g
+
+        layer = self.GetLayer()
+        self.SetLayer(pcbnew.F_CrtYd)
+
+        # the corners are in module co-ordinates already
+        corners = [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]
+        for start, end in zip(corners, corners[1:]):
+            self._Emit(DisplayList.DisplayList.SEGMENT, pcbnew.FromMM(0.05),
+                       [start, end])
+
+        self.SetLayer(layer)
+
+        return x0, y0, x1, y1
+
+    _shapes = {
+        DisplayList.DisplayList.SEGMENT: pcbnew.S_SEGMENT,
+        DisplayList.DisplayList.CIRCLE: pcbnew.S_CIRCLE,
+        DisplayList.DisplayList.ARC: pcbnew.S_ARC,
+        DisplayList.DisplayList.POLYGON: pcbnew.S_POLYGON,
+    }
+
+    def _AddGraphics(self, layer, width, items):
+        """!
+        Add graphic items of one layer and line width to the module
+
+        All their points are put on the layer's grid, see SetSnapGrid().
+
+        @param layer: the layer
+        @param width: the line width
+        @param items: sequence of (op, points, angle), as display list
+                      records without the layer and width
+        """
+        module = self.module
+        shapes = self._shapes
+        wxPoint = pcbnew.wxPoint
+        POLYGON = DisplayList.DisplayList.POLYGON
+        ARC = DisplayList.DisplayList.ARC
+
+        width = int(round(width))
+
+        # snap the points of all the items together, then split them up
+        items = list(items)
+        points = self._SnapPoints([p for op, pts, angle in items for p in pts],
+                                  self.GetSnapGrid(layer))
+
+        n = 0
+        for op, pts, angle in items:
+            pts, n = points[n:n + len(pts)], n + len(pts)
+
+            item = pcbnew.EDGE_MODULE(module)
+            item.SetWidth(width)
+            item.SetLayer(layer)
+            item.SetShape(shapes[op])
+
+            if op == POLYGON:
+                outline = item.GetPolyShape()
+                outline.NewOutline()
+                # vertices snapped together count once
+                for i, (x, y) in enumerate(pts):
+                    if i == 0 or (x, y) != pts[i - 1]:
+                        outline.Append(x, y)
+            else:
+                if op == ARC:
+                    item.SetAngle(angle)
+                item.SetStartEnd(wxPoint(*pts[0]), wxPoint(*pts[1]))
+
+            module.Add(item)
+
     def Line(self, x1, y1, x2, y2):
         """!
         Draw a line from (x1, y1) to (x2, y2)
         """
-        outline = pcbnew.EDGE_MODULE(self.module)
-        outline.SetWidth(self.GetLineThickness())
-        outline.SetLayer(self.GetLayer())
-        outline.SetShape(pcbnew.S_SEGMENT)
-        start = self.TransformPoint(x1, y1)
-        end = self.TransformPoint(x2, y2)
-        outline.SetStartEnd(start, end)
-        self.module.Add(outline)
+        self._Emit(DisplayList.DisplayList.SEGMENT, self.GetLineThickness(),
+                   [self._Transform(x1, y1), self._Transform(x2, y2)])
 
     def Circle(self, x, y, r, filled=False):
         """!
         Draw a circle at (x,y) of radius r
         If filled is true, the thickness and radius of the line will be set
-        such that the circle appears filled
+        such that the circle appears filled. When arcs are tessellated, see
+        SetArcTessellation(), a filled circle is drawn as a polygon instead
 
         @param x: the x co-ordinate of the arc centre
         @param y: the y co-ordinate of the arc centre
@@ -503,29 +1200,41 @@ class FootprintWizardDrawingAids:
                        DC line thickness
         """
 
-        circle = pcbnew.EDGE_MODULE(self.module)
-        start = self.TransformPoint(x, y)
+        if self._Tessellated():
+            pts = self._ArcPoints((x, y), (x + r, y), 3600,
+                                  self.dc['transform'])
+            if filled:
+                self._Emit(DisplayList.DisplayList.POLYGON, 0, pts[:-1])
+            else:
+                self._EmitSegments(pts)
+            return
+
+        start = self._Transform(x, y)
 
         if filled:
-            circle.SetWidth(r)
-            end = self.TransformPoint(x, y + r/2)
+            width = r
+            end = self._Transform(x, y + r/2)
         else:
-            circle.SetWidth(self.dc['lineThickness'])
-            end = self.TransformPoint(x, y + r)
+            width = self.dc['lineThickness']
+            end = self._Transform(x, y + r)
+
+        self._Emit(DisplayList.DisplayList.CIRCLE, width, [start, end])
 
-        circle.SetLayer(self.dc['layer'])
-        circle.SetShape(pcbnew.S_CIRCLE)
-        circle.SetStartEnd(start, end)
-        self.module.Add(circle)
+    def _EmitSegments(self, pts):
+        """!
+        Draw segments joining the transformed points in turn
+        """
+        width = self.dc['lineThickness']
+        for start, end in zip(pts, pts[1:]):
+            self._Emit(DisplayList.DisplayList.SEGMENT, width, [start, end])
 
     def Arc(self, cx, cy, sx, sy, a):
         """!
         Draw an arc based on centre, start and angle
 
-        The transform matrix is applied
-
-        Note that this won't work properly if the result is not a
-        circular arc (e.g. a horizontal scale)
+        The transform matrix is applied. If the result is not a circular
+        arc (e.g. under a horizontal scale), or arcs are tessellated, see
+        SetArcTessellation(), the arc is drawn as a run of segments
 
         @param cx: the x co-ordinate of the arc centre
         @param cy: the y co-ordinate of the arc centre
@@ -533,22 +1242,20 @@ class FootprintWizardDrawingAids:
         @param sy: the y co-ordinate of the arc start point
         @param a: the arc's central angle (in deci-degrees)
         """
-        circle = pcbnew.EDGE_MODULE(self.module)
-        circle.SetWidth(self.dc['lineThickness'])
-
-        center = self.TransformPoint(cx, cy)
-        start = self.TransformPoint(sx, sy)
+        if self._Tessellated():
+            self._EmitSegments(self._ArcPoints((cx, cy), (sx, sy), a,
+                                               self.dc['transform']))
+            return
 
-        circle.SetLayer(self.dc['layer'])
-        circle.SetShape(pcbnew.S_ARC)
+        center = self._Transform(cx, cy)
+        start = self._Transform(sx, sy)
 
         # check if the angle needs to be reverse (a flip scaling)
-        if cmp(self.dc['transform'][0], 0) != cmp(self.dc['transform'][4], 0):
+        if self.dc['transform'].det < 0:
             a = -a
 
-        circle.SetAngle(a)
-        circle.SetStartEnd(center, start)
-        self.module.Add(circle)
+        self._Emit(DisplayList.DisplayList.ARC, self.dc['lineThickness'],
+                   [center, start], a)
 
     def HLine(self, x, y, l):
         """!
@@ -570,21 +1277,35 @@ class FootprintWizardDrawingAids:
         """
         self.Line(x, y, x, y + l)
 
-    def Polyline(self, pts, mirrorX=None, mirrorY=None):
+    def Polyline(self, pts, mirrorX=None, mirrorY=None, filled=False):
         """!
         Draw a polyline, optionally mirroring around the given points
 
         @param pts: list of polyline vertices (list of (x, y))
         @param mirrorX: x co-ordinate of mirror point (None for no x-flip)
         @param mirrorY: y co-ordinate of mirror point (None for no y-flip)
+        @param filled: draw the outline, closed implicitly, as one filled
+                       polygon stroked with the current line thickness,
+                       rather than as one segment per edge
         """
 
         def _PolyLineInternal(pts):
             if len(pts) < 2:
                 return
 
-            for i in range(0, len(pts) - 1):
-                self.Line(pts[i][0], pts[i][1], pts[i+1][0], pts[i+1][1])
+            # each vertex is transformed once, even where two edges meet
+            width = self.dc['lineThickness']
+            tpts = self.dc['transform'].ApplyAll(pts)
+
+            if filled:
+                if len(tpts) > 2 and tpts[0] == tpts[-1]:
+                    tpts.pop()
+                self._Emit(DisplayList.DisplayList.POLYGON, width, tpts)
+                return
+
+            for start, end in zip(tpts, tpts[1:]):
+                self._Emit(DisplayList.DisplayList.SEGMENT, width,
+                           [start, end])
 
         _PolyLineInternal(pts)  # original
 
@@ -603,6 +1324,15 @@ class FootprintWizardDrawingAids:
             _PolyLineInternal(pts)
             self.PopTransform()
 
+    def _TextPosition(self, x, y, layer):
+        """!
+        The position of a text at (x, y) on the layer: transformed and
+        put on the layer's grid, as a wxPoint
+        """
+        point = self._SnapPoints([self.dc['transform'].Apply(x, y)],
+                                 self.GetSnapGrid(layer))[0]
+        return pcbnew.wxPoint(*point)
+
     def Reference(self, x, y, size, orientation_degree=0):
         """!
         Draw the module's reference as the given point.
@@ -618,7 +1348,8 @@ class FootprintWizardDrawingAids:
 
         text_size = pcbnew.wxSize(size, size)
 
-        self.module.Reference().SetPos0(self.TransformPoint(x, y))
+        self.module.Reference().SetPos0(
+            self._TextPosition(x, y, self.DefaultGraphicLayer()))
         self.module.Reference().SetPosition(
             self.module.Reference().GetPos0())
         self.module.Reference().SetTextSize(text_size)
@@ -636,14 +1367,15 @@ class FootprintWizardDrawingAids:
         """
         text_size = pcbnew.wxSize(size, size)
 
-        self.module.Value().SetPos0(self.TransformPoint(x, y))
+        self.module.Value().SetPos0(
+            self._TextPosition(x, y, self.DefaultTextValueLayer()))
         self.module.Value().SetPosition(self.module.Value().GetPos0())
         self.module.Value().SetTextSize(text_size)
         self.module.Value().SetLayer(self.DefaultTextValueLayer())
         # internal angles are in 0.1 deg
         self.module.Value().SetTextAngle(orientation_degree * 10)
 
-    def Box(self, x, y, w, h):
+    def Box(self, x, y, w, h, filled=False):
         """!
         Draw a rectangular box, centred at (x,y), with given width and
         height
@@ -652,6 +1384,7 @@ class FootprintWizardDrawingAids:
         @param y: the y co-ordinate of the box's centre
         @param w: the width of the box
         @param h: the height of the box
+        @param filled: draw the box as one stroked polygon, see Polyline()
         """
 
         pts = [[x - w/2, y - h/2],  # left
@@ -660,7 +1393,36 @@ class FootprintWizardDrawingAids:
                [x - w/2, y + h/2],  # top
                [x - w/2, y - h/2]]  # close
 
-        self.Polyline(pts)
+        self.Polyline(pts, filled=filled)
+
+    def Polygon(self, pts):
+        """!
+        Draw a filled polygon. The outline is not stroked, so the filled
+        area is exactly the given outline
+
+        @param pts: list of polygon vertices (list of (x, y)), the polygon
+                    is closed implicitly
+        """
+        self._Emit(DisplayList.DisplayList.POLYGON, 0,
+                   [self._Transform(x, y) for x, y in pts])
+
+    def FilledBox(self, x, y, w, h):
+        """!
+        Draw a filled rectangle, centred at (x,y), with given width and
+        height
+
+        @param x: the x co-ordinate of the box's centre
+        @param y: the y co-ordinate of the box's centre
+        @param w: the width of the box
+        @param h: the height of the box
+        """
+
+        pts = [[x - w/2, y - h/2],
+               [x + w/2, y - h/2],
+               [x + w/2, y + h/2],
+               [x - w/2, y + h/2]]
+
+        self.Polygon(pts)
 
     def NotchedCircle(self, x, y, r, notch_w, notch_h, rotate=0):
         """!
@@ -240,6 +240,17 @@ class FootprintWizardDrawingAids:
         return pcbnew.wxPoint(x * mat[0] + y * mat[1] + mat[2],
                               x * mat[3] + y * mat[4] + mat[5])
 
+    def PadPosition(self, x, y):
+        """
+        Return the position of a pad at (x, y), as used by the pad arrays:
+        the point transformed and rounded to whole units
+        """
+
+        mat = self.dc['transform']
+
+        return pcbnew.wxPoint(int(round(x * mat[0] + y * mat[1] + mat[2])),
+                              int(round(x * mat[3] + y * mat[4] + mat[5])))
+
     def SetLineThickness(self, lineThickness):
         """
         Set the current pen lineThickness used for subsequent drawing
@@ -21,9 +21,19 @@
 
 from __future__ import division
 
+import itertools
 import math
+import time
+
 import pcbnew
 
+def _Size(w, h):
+    """!
+    A pad or drill size rounded to whole units, as a wxSize
+    """
+    return pcbnew.wxSize(int(round(w)), int(round(h)))
+
+
 class PadMaker(object):
     """!
     Useful construction functions for common types of pads, providing
@@ -47,11 +57,11 @@ class PadMaker(object):
         @param rot_degree: the pad rotation, in degrees
         """
         pad = pcbnew.D_PAD(self.module)
-        pad.SetSize(pcbnew.wxSize(Hsize, Vsize))
+        pad.SetSize(_Size(Hsize, Vsize))
         pad.SetShape(shape)
         pad.SetAttribute(pcbnew.PAD_ATTRIB_STANDARD)
         pad.SetLayerSet(pad.StandardMask())
-        pad.SetDrillSize(pcbnew.wxSize(drill, drill))
+        pad.SetDrillSize(_Size(drill, drill))
         pad.SetOrientation(rot_degree*10)   # rotation is in 0.1 degrees
 
         return pad
@@ -72,11 +82,11 @@ class PadMaker(object):
         @param drill: the drill diameter (equals the NPTH diameter)
         """
         pad = pcbnew.D_PAD(self.module)
-        pad.SetSize(pcbnew.wxSize(drill, drill))
+        pad.SetSize(_Size(drill, drill))
         pad.SetShape(pcbnew.PAD_SHAPE_CIRCLE)
         pad.SetAttribute(pcbnew.PAD_ATTRIB_HOLE_NOT_PLATED)
         pad.SetLayerSet(pad.UnplatedHoleMask())
-        pad.SetDrillSize(pcbnew.wxSize(drill, drill))
+        pad.SetDrillSize(_Size(drill, drill))
         return pad
 
     def SMDPad(self, Vsize, Hsize, shape=pcbnew.PAD_SHAPE_RECT, rot_degree=0):
@@ -89,7 +99,7 @@ class PadMaker(object):
         @param rot_degree: the pad rotation, in degrees
         """
         pad = pcbnew.D_PAD(self.module)
-        pad.SetSize(pcbnew.wxSize(Hsize, Vsize))
+        pad.SetSize(_Size(Hsize, Vsize))
         pad.SetShape(shape)
         pad.SetAttribute(pcbnew.PAD_ATTRIB_SMD)
         pad.SetLayerSet(pad.SMDMask())
@@ -130,6 +140,9 @@ class PadArray(object):
         self.pad = pad
         self.firstPad = None
 
+        self.chunkSize = 1024
+        self.chunkCallback = None
+
     def SetPinNames(self, pinNames):
         """!
         Set a name for all the pins. If given, this overrides the
@@ -154,6 +167,24 @@ class PadArray(object):
         """
         self.firstPadNum = fpNum
 
+    def SetChunking(self, chunkSize, callback=None):
+        """!
+        Set how the pads are emitted by AddPadsToModule(): the placements
+        are generated lazily and turned into pads chunkSize at a time, so
+        the memory used on top of the pads themselves does not grow with
+        the pad count.
+
+        @param chunkSize: number of pads per chunk
+        @param callback: called after each chunk as
+            callback(pads_done, chunk_pads, seconds), e.g. to report the
+            throughput of huge arrays
+        """
+        if chunkSize < 1:
+            raise ValueError("Chunk size must be at least 1")
+
+        self.chunkSize = int(chunkSize)
+        self.chunkCallback = callback
+
     def AddPad(self, pad):
         """!
         Add a pad to the array, under the same moodule as the main
@@ -165,6 +196,11 @@ class PadArray(object):
     def GetPad(self, is_first_pad, pos):
         """!
         Get a pad in the array with the given position
+
+        Array types that place different kinds of pads override this,
+        taking the extra placement values as further arguments, see
+        Placements()
+
         @param is_first_pad: use the special first pad if there is one
         @param pos: the pad position
         """
@@ -197,6 +233,48 @@ class PadArray(object):
         """
         raise NotImplementedError;
 
+    def Placements(self):
+        """!
+        Generate the pads of the array as (x, y, is_first_pad, name_args)
+        tuples, where name_args are the arguments of the naming function.
+        Any values after these are passed on to GetPad(), e.g. to choose
+        the prototype or the orientation of each pad.
+
+        Implement this as a generator: AddPadsToModule() turns the
+        placements into pads chunk by chunk.
+        """
+        raise NotImplementedError
+
+    def AddPadsToModule(self, dc):
+        """!
+        Create the pads and add them to the module in the correct
+        positions, chunk by chunk (see SetChunking())
+
+        @param dc: the drawing context
+        """
+        placements = iter(self.Placements())
+        done = 0
+
+        while True:
+            start = time.time()
+            count = 0
+
+            for placement in itertools.islice(placements, self.chunkSize):
+                x, y, is_first, name_args = placement[:4]
+                pad = self.GetPad(is_first, dc.PadPosition(x, y),
+                                  *placement[4:])
+                pad.SetName(self.GetName(*name_args))
+                self.AddPad(pad)
+                dc.IncludePad(pad)
+                count += 1
+
+            if not count:
+                break
+
+            done += count
+            if self.chunkCallback:
+                self.chunkCallback(done, count, time.time() - start)
+
 
 class PadGridArray(PadArray):
     """!
@@ -219,6 +297,38 @@ class PadGridArray(PadArray):
         self.px = px
         self.py = py
         self.centre = centre
+        self.populated = None
+
+    def SetPopulated(self, populated):
+        """!
+        Leave out some of the grid positions, e.g. for depopulated BGAs.
+        The pads that are placed keep the names of their grid positions.
+
+        @param populated: flat sequence of nx * ny booleans, row by row
+        (index y * nx + x), True where a pad is placed, or None for all
+        """
+        if populated is not None and len(populated) != self.nx * self.ny:
+            raise ValueError("Population mask size does not match the grid")
+        self.populated = populated
+
+    def IterCells(self):
+        """!
+        Generate the (x, y) indices of the grid positions that get a pad,
+        in placement order: top-to-bottom columns, left to right
+        """
+        populated = self.populated
+        nx = self.nx
+
+        for x in range(self.nx):
+            for y in range(self.ny):
+                if populated is None or populated[y * nx + x]:
+                    yield x, y
+
+    def GetCells(self):
+        """!
+        The (x, y) indices of the grid positions that get a pad, as a list
+        """
+        return list(self.IterCells())
 
     def AlphaNameFromNumber(self, n, aIndex=1,
                             alphabet="ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
@@ -251,25 +361,19 @@ class PadGridArray(PadArray):
         return self.firstPadNum + (self.nx * y + x)
 
     #relocate the pad and add it as many times as we need
-    def AddPadsToModule(self, dc):
+    def Placements(self):
         """!
-        Create the pads and add them to the module in the correct positions
-
-        @param dc: the drawing context
+        Generate the pad placements, see PadArray.Placements()
         """
 
         pin1posX = self.centre.x - self.px * (self.nx - 1) / 2
         pin1posY = self.centre.y - self.py * (self.ny - 1) / 2
 
-        for x in range(0, self.nx):
+        # the positions are filtered before any pad is created
+        for x, y in self.IterCells():
             posX = pin1posX + (x * self.px)
-
-            for y in range(self.ny):
-                posY = pin1posY + (self.py * y)
-                pos = dc.TransformPoint(posX, posY)
-                pad = self.GetPad(x == 0 and y == 0, pos)
-                pad.SetName(self.GetName(x,y))
-                self.AddPad(pad)
+            posY = pin1posY + (self.py * y)
+            yield posX, posY, x == 0 and y == 0, (x, y)
 
 
 class EPADGridArray(PadGridArray):
@@ -287,59 +391,341 @@ class EPADGridArray(PadGridArray):
         return self.firstPadNum
 
 
-class PadZGridArray(PadArray):
+class ExposedPadArray(PadArray):
     """!
-    A staggered pin array
+    An exposed (thermal) pad: a single copper pad without paste, paste
+    apertures in a windowpane pattern and optional thermal vias.
+
+    The pad is divided into nx by ny tiles, with a via in the centre of
+    each tile. Without vias, there is one paste aperture centred in each
+    tile. With vias, each tile has four apertures, one per quarter,
+    pushed away from the via so that it sits in the cross-shaped
+    channel between them. All the apertures have the same size, a
+    fraction of their cell chosen for the target paste coverage, then
+    reduced if needed to keep the margin to the cell edges and to the
+    via keepouts.
     """
 
-    def __init__(self, pad, pad_count, line_count, line_pitch,
-                 pad_pitch, centre=pcbnew.wxPoint(0, 0)):
+    # the parts of the exposed pad
+    COPPER = 0
+    PASTE = 1
+    VIA = 2
+
+    def __init__(self, pad, nx, ny, coverage=0.5, paste_margin=0,
+                 via=None, centre=pcbnew.wxPoint(0, 0)):
+        """!
+        @param pad: the prototypical pad, with the size of the whole
+        exposed pad
+        @param nx: number of tiles in x-direction
+        @param ny: number of tiles in y-direction
+        @param coverage: target paste area, as a fraction of the pad area
+        @param paste_margin: minimum distance from the apertures to their
+        cell edges and to the vias
+        @param via: the prototypical thermal via pad, or None for no vias
+        @param centre: pad centre
+        """
+        super(ExposedPadArray, self).__init__(pad)
+
+        self.nx = int(nx)
+        self.ny = int(ny)
+        self.coverage = coverage
+        self.paste_margin = paste_margin
+        self.via = via
+        self.centre = centre
+
+    def NamingFunction(self):
+        """!
+        All the parts of the exposed pad share the first pad number
+        """
+        return self.firstPadNum
+
+    def Layout(self):
+        """!
+        Compute the via positions and the paste apertures, relative to
+        the pad centre
+
+        @return (vias, apertures, coverage): a list of via (x, y), a list
+        of aperture (x, y, w, h) and the achieved paste coverage
+        """
+        size = self.pad.GetSize()
+        w, h = size.x, size.y
+        tw = w / self.nx
+        th = h / self.ny
+
+        vias = []
+        if self.via is not None:
+            vias = [(-w / 2 + tw * (i + 0.5), -h / 2 + th * (j + 0.5))
+                    for j in range(self.ny) for i in range(self.nx)]
+
+        # paste cells, a via at one corner of each when there are vias
+        split = 2 if vias else 1
+        cnx, cny = self.nx * split, self.ny * split
+        cw, ch = tw / split, th / split
+        m = self.paste_margin
+
+        # linear scale of the apertures in their cells
+        scale = math.sqrt(max(self.coverage, 0))
+        scale = min(scale, 1 - 2 * m / min(cw, ch))
+
+        if vias:
+            # The apertures are pushed to the far corner of their cell,
+            # at the margin from its edges. The near corner, at
+            # (cw.t - m, ch.t - m) from the via with t = 1 - scale, must
+            # stay out of the keepout circle: solve for the smallest t.
+            keepout = self.via.GetSize().x / 2 + m
+            a = cw * cw + ch * ch
+            b = m * (cw + ch)
+            c = 2 * m * m - keepout * keepout
+            t = (b + math.sqrt(max(b * b - a * c, 0))) / a
+            scale = min(scale, 1 - t)
+
+        if scale <= 0:
+            return vias, [], 0
+
+        aw, ah = cw * scale, ch * scale
+
+        if vias:
+            # the via is on the tile centre side of each cell
+            dx = cw - m - aw / 2
+            dy = ch - m - ah / 2
+            apertures = [(vx + (dx if i % 2 else -dx), vy + (dy if j % 2 else -dy), aw, ah)
+                         for j in range(cny) for i in range(cnx)
+                         for vx, vy in [vias[(j // 2) * self.nx + i // 2]]]
+        else:
+            apertures = [(-w / 2 + cw * (i + 0.5), -h / 2 + ch * (j + 0.5), aw, ah)
+                         for j in range(cny) for i in range(cnx)]
+
+        return vias, apertures, scale * scale
+
+    def Placements(self):
+        """!
+        Generate the pad placements, see PadArray.Placements(): the
+        copper, then the paste apertures, then the vias. The achieved
+        paste coverage is set as soon as the generation starts.
+        """
+        vias, apertures, self.achievedCoverage = self.Layout()
+        cx, cy = self.centre.x, self.centre.y
+
+        yield cx, cy, True, (), self.COPPER
+
+        for x, y, aw, ah in apertures:
+            x, y = cx + x, cy + y
+            yield x, y, False, (), self.PASTE, (
+                x - aw / 2, y - ah / 2, x + aw / 2, y + ah / 2)
+
+        for x, y in vias:
+            yield cx + x, cy + y, False, (), self.VIA
+
+    def AddPadsToModule(self, dc):
+        """!
+        Add the parts of the exposed pad to the module, see
+        PadArray.AddPadsToModule()
+
+        The drawing context is kept while the pads are added, for
+        GetPad() to size the paste apertures around their snapped
+        centres.
+
+        @param dc: the drawing context
+        """
+        self.dc = dc
+        try:
+            super(ExposedPadArray, self).AddPadsToModule(dc)
+        finally:
+            self.dc = None
+
+    def GetPad(self, is_first_pad, pos, part=COPPER, edges=None):
+        """!
+        Get a part of the exposed pad with the given position
+
+        A paste aperture is sized to whole units around its position,
+        which is put on the pad grid, so that it stays within its edges
+        as laid out: moving the centre never moves the aperture into
+        the margin or onto the next one.
+
+        @param part: COPPER, PASTE or VIA
+        @param edges: the (left, top, right, bottom) of a paste aperture
+        """
+        if part == self.VIA:
+            pad = self.via.Duplicate()
+            pad.SetPos0(pos)
+            pad.SetPosition(pos)
+            return pad
+
+        pad = super(ExposedPadArray, self).GetPad(is_first_pad, pos)
+
+        if part == self.COPPER:
+            # copper (and mask), without paste
+            layers = pcbnew.LSET(pcbnew.F_Cu)
+            layers.AddLayer(pcbnew.F_Mask)
+        else:
+            # paste only apertures
+            layers = pcbnew.LSET(pcbnew.F_Paste)
+            pad.SetSize(self.dc.PadSizeWithin(pos, *edges))
+
+        pad.SetLayerSet(layers)
+        return pad
+
+
+class PadLatticeArray(PadArray):
+    """!
+    Pads on a lattice: pad (col, row) sits at col * a + row * b, plus an
+    optional stagger on the odd rows, and the whole array is centred on
+    its bounding box.
+
+    The numbering order is either 'z', going down the rows first (pad n
+    is in row n % line_count, which zig-zags between the lines of a
+    connector), or 'rows', filling one row after the other.
+    """
+
+    def __init__(self, pad, pad_count, line_count, a, b, stagger=(0, 0),
+                 order='z', centre=pcbnew.wxPoint(0, 0)):
         """!
         @param pad: the prototypical pad
         @param pad_count: total pad count
-        @param line_count: number of staggered lines
-        @param line_pitch: distance between lines
-        @param pad_pitch: distance between pads in a line
+        @param line_count: number of rows
+        @param a: (x, y) step from one column to the next
+        @param b: (x, y) step from one row to the next
+        @param stagger: (x, y) offset of the odd rows
+        @param order: numbering order, 'z' or 'rows'
         @param centre: array centre point
         """
-        super(PadZGridArray, self).__init__(pad)
+        super(PadLatticeArray, self).__init__(pad)
+
+        if order not in ('z', 'rows'):
+            raise ValueError("Unknown lattice numbering order: %s" % order)
 
         self.pad_count = int(pad_count)
         self.line_count = int(line_count)
-        self.line_pitch = line_pitch
-        self.pad_pitch = pad_pitch
+        self.a = a
+        self.b = b
+        self.stagger = stagger
+        self.order = order
         self.centre = centre
 
-    def NamingFunction(self, pad_pos):
+    def NamingFunction(self, n):
         """!
         Naming just increased with pad index in array
         """
-        return self.firstPadNum + pad_pos
+        return self.firstPadNum + n
 
-    def AddPadsToModule(self, dc):
+    def IterIndices(self):
         """!
-        Create the pads and add them to the module in the correct positions
+        Generate the (col, row) lattice indices of the pads, in numbering
+        order
+        """
+        if self.order == 'z':
+            lines = self.line_count
+            for n in range(self.pad_count):
+                yield n // lines, n % lines
+        else:
+            per_row = -(-self.pad_count // self.line_count)
+            for n in range(self.pad_count):
+                yield n % per_row, n // per_row
 
-        @param dc: the drawing context
+    def GetIndices(self):
+        """!
+        The (col, row) lattice indices of the pads, as a list
         """
+        return list(self.IterIndices())
 
-        pin1posX = self.centre.x - self.pad_pitch * (self.pad_count - 1) / 2
-        pin1posY = self.centre.y + self.line_pitch * (self.line_count - 1) / 2
-        line = 0
+    def _IterRaw(self):
+        (ax, ay), (bx, by), (sx, sy) = self.a, self.b, self.stagger
 
-        for padnum in range(0, self.pad_count):
-            posX = pin1posX + (padnum * self.pad_pitch)
-            posY = pin1posY - (self.line_pitch * line)
+        for col, row in self.IterIndices():
+            if row % 2:
+                yield col * ax + row * bx + sx, col * ay + row * by + sy
+            else:
+                yield col * ax + row * bx, col * ay + row * by
 
-            pos = dc.TransformPoint(posX, posY)
-            pad = self.GetPad(padnum == 0, pos)
-            pad.SetName(self.GetName(padnum))
-            self.AddPad(pad)
+    def GetBounds(self):
+        """!
+        The box the array is centred on, before centring: the bounding
+        box of the pad centres, found in a pass over the lattice so
+        nothing is held in memory
 
-            line += 1
+        @return (x0, y0, x1, y1), or None if there are no pads
+        """
+        x0 = y0 = x1 = y1 = None
+        for x, y in self._IterRaw():
+            if x0 is None:
+                x0 = x1 = x
+                y0 = y1 = y
+            else:
+                x0, x1 = min(x0, x), max(x1, x)
+                y0, y1 = min(y0, y), max(y1, y)
 
-            if line >= self.line_count:
-                line = 0
+        if x0 is None:
+            return None
+
+        return x0, y0, x1, y1
+
+    def IterPositions(self):
+        """!
+        Generate the pad centres, in numbering order
+        """
+        bounds = self.GetBounds()
+        if bounds is None:
+            return
+
+        x0, y0, x1, y1 = bounds
+        dx = self.centre.x - (x0 + x1) / 2
+        dy = self.centre.y - (y0 + y1) / 2
+
+        for x, y in self._IterRaw():
+            yield x + dx, y + dy
+
+    def GetPositions(self):
+        """!
+        The pad centres, in numbering order
+
+        @return list of (x, y)
+        """
+        return list(self.IterPositions())
+
+    def Placements(self):
+        """!
+        Generate the pad placements, see PadArray.Placements()
+        """
+        for n, (x, y) in enumerate(self.IterPositions()):
+            yield x, y, n == 0, (n,)
+
+
+class PadZGridArray(PadLatticeArray):
+    """!
+    A staggered pin array: the pads advance by one pad pitch each, while
+    cycling through the lines
+    """
+
+    def __init__(self, pad, pad_count, line_count, line_pitch,
+                 pad_pitch, centre=pcbnew.wxPoint(0, 0)):
+        """!
+        @param pad: the prototypical pad
+        @param pad_count: total pad count
+        @param line_count: number of staggered lines
+        @param line_pitch: distance between lines
+        @param pad_pitch: distance between pads in a line
+        @param centre: array centre point
+        """
+        line_count = int(line_count)
+
+        super(PadZGridArray, self).__init__(
+            pad, pad_count, line_count,
+            (line_count * pad_pitch, 0), (pad_pitch, -line_pitch),
+            centre=centre)
+
+        self.line_pitch = line_pitch
+        self.pad_pitch = pad_pitch
+
+    def GetBounds(self):
+        """!
+        The pads span pad_count pitches across and every line down, even
+        when there are fewer pads than lines, as the Z-grid always did
+        """
+        if self.pad_count < 1:
+            return None
+
+        return (0, -self.line_pitch * (self.line_count - 1),
+                self.pad_pitch * (self.pad_count - 1), 0)
 
 
 class PadLineArray(PadGridArray):
@@ -365,6 +751,103 @@ class PadLineArray(PadGridArray):
             super(PadLineArray, self).__init__(pad, n, 1, pitch, 0, centre)
 
 
+class PadQuadArray(PadArray):
+    """!
+    The four sides of pads of a quad package (QFP, QFN), numbered
+    counter-clockwise from the top of the left side: down the left
+    side, along the bottom to the right, up the right side and back
+    along the top.
+    """
+
+    def __init__(self, pad, nx, ny, pitch, h_spacing, v_spacing,
+                 centre=pcbnew.wxPoint(0, 0)):
+        """!
+        @param pad: the prototypical pad, as on the top and bottom sides;
+        the left and right sides use it turned by 90 degrees
+        @param nx: number of pads on the top and bottom sides
+        @param ny: number of pads on the left and right sides
+        @param pitch: distance between pad centres along a side
+        @param h_spacing: distance between the left and right pad centres
+        @param v_spacing: distance between the top and bottom pad centres
+        @param centre: array centre point
+        """
+        super(PadQuadArray, self).__init__(pad)
+
+        self.nx = int(nx)
+        self.ny = int(ny)
+        self.pitch = pitch
+        self.h_spacing = h_spacing
+        self.v_spacing = v_spacing
+        self.centre = centre
+
+    def NamingFunction(self, n):
+        """!
+        Sequential naming around the package
+        @param n: the pad index, counter-clockwise from pin 1
+        """
+        return self.firstPadNum + n
+
+    def IterPositions(self):
+        """!
+        Generate the pad centres, in numbering order, with a flag telling
+        the pads of the left and right sides, as (x, y, is_side)
+        """
+        cx, cy = self.centre.x, self.centre.y
+        p = self.pitch
+        x_start = p * (self.nx - 1) / 2
+        y_start = p * (self.ny - 1) / 2
+        left = cx - self.h_spacing / 2
+        right = cx + self.h_spacing / 2
+        top = cy - self.v_spacing / 2
+        bottom = cy + self.v_spacing / 2
+
+        for i in range(self.ny):
+            yield left, cy - y_start + p * i, True
+        for i in range(self.nx):
+            yield cx - x_start + p * i, bottom, False
+        for i in range(self.ny):
+            yield right, cy + y_start - p * i, True
+        for i in range(self.nx):
+            yield cx + x_start - p * i, top, False
+
+    def GetPositions(self):
+        """!
+        The pad centres, see IterPositions()
+
+        @return list of (x, y, is_side)
+        """
+        return list(self.IterPositions())
+
+    def Placements(self):
+        """!
+        Generate the pad placements, see PadArray.Placements()
+        """
+        # one turned prototype serves both the left and right sides
+        self.sidePad = self.pad.Duplicate()
+        self.sidePad.SetOrientation(self.pad.GetOrientation() + 900)
+
+        for n, (x, y, is_side) in enumerate(self.IterPositions()):
+            yield x, y, n == 0, (n,), is_side
+
+    def GetPad(self, is_first_pad, pos, is_side=False):
+        """!
+        Get a pad in the array with the given position, turned for the
+        left and right sides
+
+        @param is_side: the pad is on the left or right side
+        """
+        if self.firstPad and is_first_pad:
+            pad = self.firstPad
+        else:
+            pad = self.sidePad if is_side else self.pad
+
+        pad = pad.Duplicate()
+        pad.SetPos0(pos)
+        pad.SetPosition(pos)
+
+        return pad
+
+
 class PadCircleArray(PadArray):
     """!
     Circular pad array
@@ -399,29 +882,177 @@ class PadCircleArray(PadArray):
         """
         return str(self.firstPadNum + n)
 
-    def AddPadsToModule(self, dc):
+    def Placements(self):
         """!
-        Create the pads and add them to the module in the correct positions
-
-        @param dc: the drawing context
+        Generate the pad placements, see PadArray.Placements(), with the
+        pad orientation in deci-degrees
         """
+        cx, cy = self.centre.x, self.centre.y
 
-        for pin in range(0, self.n):
-            angle = self.angle_offset + (360 / self.n) * pin
+        step = 360 / self.n
+        if not self.clockwise:
+            step = -step
 
-            if not self.clockwise:
-                angle = -angle
+        # the positions follow a rotation recurrence, rather than a sin
+        # and cos per pin
+        angle = self.angle_offset if self.clockwise else -self.angle_offset
+        sin_a = math.sin(math.radians(angle))
+        cos_a = math.cos(math.radians(angle))
+        sin_s = math.sin(math.radians(step))
+        cos_s = math.cos(math.radians(step))
 
-            pos_x = math.sin(angle * math.pi / 180) * self.r
-            pos_y = -math.cos(angle  * math.pi / 180) * self.r
-            pos = dc.TransformPoint(pos_x, pos_y)
-            pad = self.GetPad(pin == 0, pos)
+        for pin in range(0, self.n):
             padAngle = self.padRotationOffset
             if self.padRotationEnable:
-                padAngle -=angle
-            pad.SetOrientation(padAngle*10)
-            pad.SetName(self.GetName(pin))
-            self.AddPad(pad)
+                padAngle -= angle + step * pin
+
+            yield (cx + sin_a * self.r, cy - cos_a * self.r, pin == 0, (pin,),
+                   padAngle * 10)
+
+            sin_a, cos_a = (sin_a * cos_s + cos_a * sin_s,
+                            cos_a * cos_s - sin_a * sin_s)
+
+    def GetPad(self, is_first_pad, pos, orientation=0):
+        """!
+        Get a pad in the array with the given position and orientation
+
+        @param orientation: the pad orientation in deci-degrees
+        """
+        pad = super(PadCircleArray, self).GetPad(is_first_pad, pos)
+        pad.SetOrientation(orientation)
+        return pad
+
+
+class PadConcentricArray(PadArray):
+    """!
+    Concentric rings of pads, each ring a PadCircleArray. Numbering
+    runs around the first ring, then carries on around the next one.
+    """
+
+    def __init__(self, pad, rings, centre=pcbnew.wxPoint(0, 0),
+                 padRotationEnable=False, padRotationOffset=0):
+        """!
+        @param pad: the prototypical pad
+        @param rings: list of (n, r, angle_offset, clockwise) per ring:
+        pad count, radius, angle of the first pad and numbering direction
+        @param centre: array centre point
+        @param padRotationEnable: also rotate pads when placing
+        @param padRotationOffset: rotation of first pad
+        """
+        super(PadConcentricArray, self).__init__(pad)
+
+        self.rings = [(int(n), r, a, cw) for n, r, a, cw in rings]
+        self.centre = centre
+        self.padRotationEnable = padRotationEnable
+        self.padRotationOffset = padRotationOffset
+
+    def GetPadCount(self):
+        """!
+        @return the total number of pads in all the rings
+        """
+        return sum(ring[0] for ring in self.rings)
+
+    @staticmethod
+    def MinimumSpacing(rings):
+        """!
+        The exact minimum distance between the centres of any two pads
+
+        Within a ring of n pads at radius r, it is the chord 2r.sin(pi/n).
+        Between two rings of n1 and n2 pads, the angular differences
+        between their pads are the phase difference plus the multiples
+        of 2.pi/lcm(n1, n2), so the closest pair follows from the phase
+        difference modulo 2.pi/lcm.
+
+        The smallest chord bounds the answer, and so do the distances
+        between neighbouring rings, found in one pass over the rings
+        sorted by radius. Two rings further apart can only come closer
+        than that if their radial gap is smaller, so each ring is then
+        only compared with the rings above it within the bound. This is
+        O(rings) for rings spaced further apart than the pad pitch. It
+        grows to O(rings.k), for k rings within the bound of each ring,
+        when the rings are packed closer than that: the closest pair can
+        then be between any two of them.
+
+        @param rings: list of (n, r, angle_offset, clockwise), as for the
+        constructor
+        @return the minimum distance, or None for fewer than two pads
+        """
+        # a counterclockwise ring covers the same positions as a
+        # clockwise one with the opposite phase
+        rings = sorted((r, int(n), math.radians(a if cw else -a))
+                       for n, r, a, cw in rings)
+
+        distances = [2 * r * math.sin(math.pi / n) for r, n, phase in rings
+                     if n > 1]
+        distances += [PadConcentricArray._RingDistance(a, b)
+                      for a, b in zip(rings, rings[1:])]
+        best = min(distances) if distances else None
+
+        for i, ring in enumerate(rings):
+            for other in rings[i + 2:]:
+                if other[0] - ring[0] >= best:
+                    break
+                best = min(best, PadConcentricArray._RingDistance(ring, other))
+
+        return best
+
+    @staticmethod
+    def _RingDistance(ring1, ring2):
+        """!
+        The minimum distance between the pads of two rings, given as
+        (r, n, phase), see MinimumSpacing()
+        """
+        r1, n1, phase1 = ring1
+        r2, n2, phase2 = ring2
+
+        lcm = n1 * n2 // PadConcentricArray._Gcd(n1, n2)
+        period = 2 * math.pi / lcm
+        delta = (phase2 - phase1) % period
+        delta = min(delta, period - delta)
+
+        return math.sqrt(max(0, r1 * r1 + r2 * r2 -
+                             2 * r1 * r2 * math.cos(delta)))
+
+    @staticmethod
+    def _Gcd(a, b):
+        while b:
+            a, b = b, a % b
+        return a
+
+    def NamingFunction(self, n):
+        """!
+        Sequential naming across the rings
+        """
+        return str(self.firstPadNum + n)
+
+    def Placements(self):
+        """!
+        Generate the pad placements, see PadArray.Placements(): each
+        ring in turn, as placed by a PadCircleArray
+        """
+        num = 0
+
+        for i, (n, r, angle_offset, clockwise) in enumerate(self.rings):
+            ring = PadCircleArray(
+                self.pad, n, r, angle_offset=angle_offset,
+                centre=self.centre, clockwise=clockwise,
+                padRotationEnable=self.padRotationEnable,
+                padRotationOffset=self.padRotationOffset)
+
+            for x, y, is_first, (pin,), orientation in ring.Placements():
+                yield (x, y, is_first and i == 0, (num + pin,), orientation)
+
+            num += n
+
+    def GetPad(self, is_first_pad, pos, orientation=0):
+        """!
+        Get a pad in the array with the given position and orientation
+
+        @param orientation: the pad orientation in deci-degrees
+        """
+        pad = super(PadConcentricArray, self).GetPad(is_first_pad, pos)
+        pad.SetOrientation(orientation)
+        return pad
 
 
 class PadCustomArray(PadArray):
@@ -445,15 +1076,10 @@ class PadCustomArray(PadArray):
         """
         return str(self.firstPadNum + n)
 
-    def AddPadsToModule(self, dc):
+    def Placements(self):
         """!
-        Create the pads and add them to the module in the correct positions
-
-        @param dc: the drawing context
+        Generate the pad placements, see PadArray.Placements()
         """
 
-        for i in range(len(self.array)):
-            pos = dc.TransformPoint(self.array[i][0], self.array[i][1])
-            pad = self.GetPad(i == 0, pos)
-            pad.SetName(self.GetName(i))
-            self.AddPad(pad)
+        for i, pos in enumerate(self.array):
+            yield pos[0], pos[1], i == 0, (i,)
@@ -0,0 +1,205 @@
+#  SpatialIndex.py
+#
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+#
+
+from __future__ import division
+
+import math
+
+
+def BoxDistance(a, b):
+    """!
+    Distance between two axis-aligned boxes, 0 if they touch or overlap
+
+    @param a: box as (left, top, right, bottom)
+    @param b: box as (left, top, right, bottom)
+    """
+    dx = max(a[0] - b[2], b[0] - a[2], 0)
+    dy = max(a[1] - b[3], b[1] - a[3], 0)
+    return math.hypot(dx, dy)
+
+
+def _PointSegmentDistance(px, py, x0, y0, x1, y1):
+    dx = x1 - x0
+    dy = y1 - y0
+    ll = dx * dx + dy * dy
+    t = 0 if ll == 0 else max(0, min(1, ((px - x0) * dx + (py - y0) * dy) / ll))
+    return math.hypot(px - x0 - t * dx, py - y0 - t * dy)
+
+
+def _ClipToBox(seg, box):
+    # Liang-Barsky: the parameter interval of the segment inside the box
+    x0, y0, x1, y1 = seg
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = 0, 1
+    for p, q in ((-dx, x0 - box[0]), (dx, box[2] - x0),
+                 (-dy, y0 - box[1]), (dy, box[3] - y0)):
+        if p == 0:
+            if q < 0:
+                return None
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+    return (t0, t1) if t0 < t1 else None
+
+
+def SegmentBoxDistance(seg, box):
+    """!
+    Distance between a segment and an axis-aligned box, 0 if they meet
+
+    For two convex shapes that do not meet, the closest points include
+    a vertex of one of them, so the endpoints are measured against the
+    box and the box corners against the segment.
+
+    @param seg: segment as (x0, y0, x1, y1)
+    @param box: box as (left, top, right, bottom)
+    """
+    x0, y0, x1, y1 = seg
+    left, top, right, bottom = box
+
+    if _ClipToBox(seg, box) is not None:
+        return 0
+
+    return min([BoxDistance((x, y, x, y), box) for x, y in ((x0, y0), (x1, y1))] +
+               [_PointSegmentDistance(x, y, x0, y0, x1, y1)
+                for x in (left, right) for y in (top, bottom)])
+
+
+def _ClipToCircle(seg, cx, cy, r):
+    # the parameter interval of the segment inside the circle
+    x0, y0, x1, y1 = seg
+    dx, dy = x1 - x0, y1 - y0
+    fx, fy = x0 - cx, y0 - cy
+    a = dx * dx + dy * dy
+    if a == 0:
+        return (0, 1) if fx * fx + fy * fy < r * r else None
+    b = fx * dx + fy * dy
+    disc = b * b - a * (fx * fx + fy * fy - r * r)
+    if disc <= 0:
+        return None
+    root = math.sqrt(disc)
+    t0 = max(0, (-b - root) / a)
+    t1 = min(1, (-b + root) / a)
+    return (t0, t1) if t0 < t1 else None
+
+
+def SegmentRoundedBoxInterval(seg, box, r):
+    """!
+    The part of a segment that is inside a box grown by a radius
+
+    The grown box is the box stretched by r in x, the box stretched by r
+    in y and four circles of radius r on the corners. It is convex, so
+    the union of the parts inside each is a single interval.
+
+    @param seg: segment as (x0, y0, x1, y1)
+    @param box: box as (left, top, right, bottom)
+    @param r: the radius
+    @return the (t0, t1) parameter interval along the segment, 0 at its
+            start and 1 at its end, or None if the segment stays outside
+    """
+    left, top, right, bottom = box
+    parts = [_ClipToBox(seg, (left - r, top, right + r, bottom)),
+             _ClipToBox(seg, (left, top - r, right, bottom + r))]
+    parts += [_ClipToCircle(seg, x, y, r)
+              for x in (left, right) for y in (top, bottom)]
+    parts = [p for p in parts if p is not None]
+
+    if not parts:
+        return None
+
+    return min(p[0] for p in parts), max(p[1] for p in parts)
+
+
+class SpatialIndex(object):
+    """!
+    A uniform grid over axis-aligned boxes, to find the items near each
+    other without comparing every pair.
+
+    Each item is filed under every grid cell its box overlaps. With a
+    cell size around the typical item size, each item shares cells with
+    a handful of neighbours only, and finding all the close pairs is
+    near-linear in the number of items.
+    """
+
+    def __init__(self, cell):
+        """!
+        @param cell: the grid cell size
+        """
+        if cell <= 0:
+            raise ValueError("Grid cell size must be positive")
+
+        self.cell = cell
+        self.cells = {}
+        self.items = []
+        self.boxes = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def _Cells(self, box, margin=0):
+        c = self.cell
+        i0 = int(math.floor((box[0] - margin) / c))
+        j0 = int(math.floor((box[1] - margin) / c))
+        i1 = int(math.floor((box[2] + margin) / c))
+        j1 = int(math.floor((box[3] + margin) / c))
+
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                yield i, j
+
+    def Insert(self, item, box):
+        """!
+        Add an item
+
+        @param item: the item, anything
+        @param box: its bounding box as (left, top, right, bottom)
+        """
+        n = len(self.items)
+        self.items.append(item)
+        self.boxes.append(box)
+
+        for key in self._Cells(box):
+            self.cells.setdefault(key, []).append(n)
+
+    def _Near(self, box, margin):
+        found = set()
+        for key in self._Cells(box, margin):
+            for n in self.cells.get(key, ()):
+                if n not in found and BoxDistance(box, self.boxes[n]) <= margin:
+                    found.add(n)
+        return found
+
+    def Query(self, box, margin=0):
+        """!
+        The items whose boxes are within margin of the given box
+
+        @return list of items, in insertion order
+        """
+        return [self.items[n] for n in sorted(self._Near(box, margin))]
+
+    def Pairs(self, margin=0):
+        """!
+        Generate the pairs of items whose boxes are within margin of each
+        other, each pair once, as (first inserted, last inserted)
+        """
+        for n, box in enumerate(self.boxes):
+            for m in sorted(self._Near(box, margin)):
+                if m > n:
+                    yield self.items[n], self.items[m]
@@ -15,6 +15,9 @@
 #
 
 from __future__ import division
+import csv
+import re
+
 import pcbnew
 
 import FootprintWizardBase
@@ -23,14 +26,111 @@ import PadArray as PA
 
 class BGAPadGridArray(PA.PadGridArray):
 
+    # JEDEC row letters, without I, O, Q, S, X and Z
+    ROW_ALPHABET = "ABCDEFGHJKLMNPRTUVWY"
+
     def NamingFunction(self, n_x, n_y):
         return "%s%d" % (
-            self.AlphaNameFromNumber(n_y + 1, alphabet="ABCDEFGHJKLMNPRTUVWY"),
+            self.AlphaNameFromNumber(n_y + 1, alphabet=self.ROW_ALPHABET),
             n_x + 1)
 
+    @classmethod
+    def CellFromName(cls, name):
+        """
+        The (x, y) grid indices of a ball name such as "A1" or "AB12",
+        the inverse of NamingFunction
+        """
+        m = re.match(r'^\s*([A-Z]+)(\d+)\s*$', name.upper())
+        if not m:
+            raise ValueError("Bad ball name: %s" % name)
+
+        row = 0
+        for c in m.group(1):
+            i = cls.ROW_ALPHABET.find(c)
+            if i < 0:
+                raise ValueError("Bad ball row letter: %s" % name)
+            row = row * len(cls.ROW_ALPHABET) + i + 1
+
+        return int(m.group(2)) - 1, row - 1
+
+
+def BitmapMask(bitmap, cols, rows):
+    """
+    Population mask from a bitmap: one string of cols characters per row,
+    rows separated by ';' or new lines. '0', '.' and '-' are empty
+    positions, any other character a ball.
+
+    @return flat list of booleans, row by row
+    """
+    lines = [l.strip() for l in re.split(r'[;\n]', bitmap) if l.strip()]
+
+    if len(lines) != rows or any(len(l) != cols for l in lines):
+        raise ValueError("Bitmap must be {r} rows of {c} characters".format(
+            r=rows, c=cols))
+
+    return [c not in '0.-' for c in ''.join(lines)]
+
+
+def RangeMask(expr, cols, rows):
+    """
+    Population mask from a list of balls to remove: names and rectangular
+    ranges, separated by commas, e.g. "A1, D4:F6"
+
+    @return flat list of booleans, row by row
+    """
+    populated = [True] * (cols * rows)
+
+    for item in expr.split(','):
+        if not item.strip():
+            continue
+        ends = [BGAPadGridArray.CellFromName(n) for n in item.split(':')]
+        if len(ends) > 2:
+            raise ValueError("Bad ball range: %s" % item)
+        if any(x >= cols or y >= rows for x, y in ends):
+            raise ValueError("Ball outside the grid: %s" % item.strip())
+        (x0, y0), (x1, y1) = ends[0], ends[-1]
+
+        for y in range(min(y0, y1), max(y0, y1) + 1):
+            row = y * cols
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                populated[row + x] = False
+
+    return populated
+
+
+def BallMapMask(path, cols, rows):
+    """
+    Population mask from a ball-map CSV file: the first column of every
+    line names a ball that is present. Lines that do not start with a
+    ball name (e.g. a header) are skipped.
+
+    @return flat list of booleans, row by row
+    """
+    populated = [False] * (cols * rows)
+
+    with open(path) as f:
+        for line in csv.reader(f):
+            if not line:
+                continue
+            try:
+                x, y = BGAPadGridArray.CellFromName(line[0])
+            except ValueError:
+                continue
+            if x >= cols or y >= rows:
+                raise ValueError("Ball outside the grid: %s" % line[0])
+            populated[y * cols + x] = True
+
+    return populated
+
 
 class BGAWizard(FootprintWizardBase.FootprintWizard):
 
+    # the mirrored silkscreen corners redraw the original corner each time
+    recordGraphics = True
+    optimizeGraphics = True
+
+    checkClearances = True
+
     def GetName(self):
         return "BGA"
 
@@ -47,6 +147,11 @@ class BGAWizard(FootprintWizardBase.FootprintWizard):
         self.AddParam("Package", "length", self.uMM, 6, designator='Y')
         self.AddParam("Package", "margin", self.uMM, 0.25, min_value=0.2, hint="Courtyard margin")
 
+        # the three masks combine: a ball is placed if none removes it
+        self.AddParam("Depopulation", "bitmap", self.uString, '', hint="Rows of 1 (ball) and 0 (empty), separated by ';'")
+        self.AddParam("Depopulation", "remove", self.uString, '', hint="Balls to remove, e.g. A1, D4:F6")
+        self.AddParam("Depopulation", "ball map", self.uString, '', hint="CSV file listing the balls present")
+
     def CheckParameters(self):
 
         # check that the package is large enough
@@ -57,8 +162,33 @@ class BGAWizard(FootprintWizardBase.FootprintWizard):
         self.CheckParam('Package','width',min_value=width,info="Package width is too small (< {w}mm)".format(w=width))
         self.CheckParam('Package','length',min_value=length,info="Package length is too small (< {l}mm".format(l=length))
 
+        self.populated = None
+        cols = self.parameters['Pads']['columns']
+        rows = self.parameters['Pads']['rows']
+        depop = self.parameters['Depopulation']
+
+        for name, mask in (('bitmap', BitmapMask), ('remove', RangeMask),
+                           ('ball map', BallMapMask)):
+            value = str(depop[name]).strip()
+            if not value:
+                continue
+            try:
+                populated = mask(value, cols, rows)
+            except (IOError, OSError, ValueError) as err:
+                self.GetParam('Depopulation', name).AddError(str(err))
+                continue
+
+            if self.populated is None:
+                self.populated = populated
+            else:
+                self.populated = [a and b for a, b in
+                                  zip(self.populated, populated)]
+
     def GetValue(self):
-        pins = (self.parameters["Pads"]["rows"] * self.parameters["Pads"]["columns"])
+        if self.populated is None:
+            pins = (self.parameters["Pads"]["rows"] * self.parameters["Pads"]["columns"])
+        else:
+            pins = sum(self.populated)
 
         return "BGA-{n}_{a}x{b}_{x}x{y}mm".format(
                 n = pins,
@@ -85,6 +215,7 @@ class BGAWizard(FootprintWizardBase.FootprintWizard):
                                   -((rows - 1) * pad_pitch) / 2)
 
         array = BGAPadGridArray(pad, cols, rows, pad_pitch, pad_pitch)
+        array.SetPopulated(self.populated)
         array.AddPadsToModule(self.draw)
 
         # Draw box outline on F.Fab layer
@@ -139,21 +270,8 @@ class BGAWizard(FootprintWizardBase.FootprintWizard):
         # Draw a circle in the bevel void
         self.draw.Circle( -ssx, -ssy, pcbnew.FromMM(0.2), filled=True)
 
-        # Courtyard
-        cmargin = self.parameters['Package']['margin']
-        self.draw.SetLayer(pcbnew.F_CrtYd)
-        sizex = (ssx + cmargin) * 2
-        sizey = (ssy + cmargin) * 2
-
-        # round size to nearest 0.1mm, rectangle will thus land on a 0.05mm grid
-        sizex = pcbnew.PutOnGridMM(sizex, 0.1)
-        sizey = pcbnew.PutOnGridMM(sizey, 0.1)
-
-        # set courtyard line thickness to the one defined in KLC
-        self.draw.SetLineThickness(pcbnew.FromMM(0.05))
-        self.draw.Box(0, 0, sizex, sizey)
-        # restore line thickness to previous value
-        self.draw.SetLineThickness(pcbnew.FromMM(cmargin))
+        # Courtyard around the balls and the F.Fab outline
+        self.draw.AutoCourtyard(self.parameters['Package']['margin'])
 
         #reference and value
         text_size = self.GetTextSize()  # IPC nominal
@@ -165,3 +283,23 @@ class BGAWizard(FootprintWizardBase.FootprintWizard):
         self.module.SetAttributes(pcbnew.MOD_CMS)
 
 BGAWizard().register()
+
+
+if __name__ == '__main__':
+    # Benchmark a large depopulated BGA: 64x64 grid with the centre and
+    # the corner balls removed
+    import timeit
+
+    wizard = BGAWizard()
+    wizard.GetParam("Pads", "columns").SetValue(64)
+    wizard.GetParam("Pads", "rows").SetValue(64)
+    wizard.GetParam("Package", "width").SetValue(66)
+    wizard.GetParam("Package", "length").SetValue(66)
+    wizard.GetParam("Depopulation", "remove").SetValue(
+        "M12:BN53, A1, A64, CD1, CD64")
+
+    runs = 5
+    seconds = timeit.timeit(wizard.BuildFootprint, number=runs) / runs
+    print(wizard.buildmessages.splitlines()[0])
+    print("{n} balls: {t:.3f}s per footprint".format(
+        n=len(wizard.module.Pads()), t=seconds))
@@ -0,0 +1,207 @@
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+from __future__ import division
+
+import os
+
+import pcbnew
+import FootprintWizardBase
+import BitmapImage
+
+
+class BitmapWizard(FootprintWizardBase.FootprintWizard):
+    """!
+    Logos and artwork from a PBM, PGM or PNG image, as merged rectangles
+    or stepped polygons on one layer
+    """
+
+    # layer choices, by board layer name
+    LAYERS = {
+        'F.SilkS': pcbnew.F_SilkS,
+        'B.SilkS': pcbnew.B_SilkS,
+        'F.Cu': pcbnew.F_Cu,
+        'B.Cu': pcbnew.B_Cu,
+        'F.Mask': pcbnew.F_Mask,
+        'B.Mask': pcbnew.B_Mask,
+        'F.Fab': pcbnew.F_Fab,
+        'B.Fab': pcbnew.B_Fab,
+    }
+
+    LAYER_NAMES = ['F.SilkS', 'B.SilkS', 'F.Cu', 'B.Cu',
+                   'F.Mask', 'B.Mask', 'F.Fab', 'B.Fab']
+
+    SHAPES = ['rectangles', 'polygons']
+
+    def GetName(self):
+        return "Bitmap"
+
+    def GetDescription(self):
+        return "Footprint artwork from a PBM, PGM or PNG image"
+
+    def GetReferencePrefix(self):
+        return "G***"
+
+    def GetValue(self):
+        name = os.path.basename(self.image_path)
+        return "Bitmap_%s" % (os.path.splitext(name)[0] or "Image")
+
+    def GenerateParameterList(self):
+        self.AddParam("Image", "File", self.uString, '',
+                      hint="PBM, PGM or PNG file")
+        self.AddParam("Image", "Threshold", self.uPercent, 50,
+                      min_value=0, max_value=100,
+                      hint="Pixels darker than this are drawn")
+        self.AddParam("Image", "Negative", self.uBool, False,
+                      hint="Draw the light pixels instead of the dark ones")
+        self.AddParam("Image", "Pixel Width", self.uMM, 0.1, min_value=0.01)
+
+        self.AddParam("Output", "Layer", self.LAYER_NAMES, 'F.SilkS')
+        self.AddParam("Output", "Shape", self.SHAPES, 'rectangles',
+                      hint="Merged rectangles, or stepped polygons")
+
+    def CheckParameters(self):
+        self.image_path = str(self.parameters['Image']['File'])
+        self.image = None
+
+        self.CheckParam('Image', 'Threshold')
+        self.CheckParam('Image', 'Pixel Width')
+
+        if not self.image_path:
+            self.GetParam('Image', 'File').AddError(
+                "No image file given")
+            return
+
+        # only the header is read here, the rows are streamed when building
+        try:
+            self.image = BitmapImage.OpenImage(self.image_path)
+        except (IOError, OSError, ValueError) as err:
+            self.GetParam('Image', 'File').AddError(
+                "Cannot read image", str(err))
+
+    def _PixelOrigin(self):
+        # pixel coordinates to board coordinates, with the image centred
+        X = self.parameters['Image']['Pixel Width']
+        x0 = -int(self.image.width * X / 2)
+        y0 = -int(self.image.height * X / 2)
+        return X, x0, y0
+
+    def _Polygon(self, layer, points):
+        polygon = pcbnew.EDGE_MODULE(self.module)
+        polygon.SetShape(pcbnew.S_POLYGON)
+        polygon.SetWidth(0)
+        polygon.SetLayer(layer)
+        polygon.GetPolyShape().NewOutline()
+        for x, y in points:
+            polygon.GetPolyShape().Append(x, y)
+        self.module.Add(polygon)
+
+    def _CopperPad(self, layer):
+        # the copper pads carry the matching solder mask opening
+        mask = pcbnew.F_Mask if layer == pcbnew.F_Cu else pcbnew.B_Mask
+        pad = pcbnew.D_PAD(self.module)
+        pad.SetAttribute(pcbnew.PAD_ATTRIB_SMD)
+        pad.SetName("")
+        layerset = pcbnew.LSET()
+        layerset.AddLayer(layer)
+        layerset.AddLayer(mask)
+        pad.SetLayerSet(layerset)
+        return pad
+
+    def _DrawRectangles(self, layer, rows, copper):
+        X, x0, y0 = self._PixelOrigin()
+        count = 0
+
+        if copper:
+            proto = self._CopperPad(layer)
+            proto.SetShape(pcbnew.PAD_SHAPE_RECT)
+
+        for x, y, w, h in BitmapImage.MergedRectangles(rows):
+            left = x0 + x * X
+            top = y0 + y * X
+            right = left + w * X
+            bottom = top + h * X
+
+            if copper:
+                pad = proto.Duplicate()
+                pad.SetSize(pcbnew.wxSize(w * X, h * X))
+                pad.SetPosition(pcbnew.wxPoint((left + right) // 2,
+                                               (top + bottom) // 2))
+                self.module.Add(pad)
+            else:
+                self._Polygon(layer, [(left, top), (right, top),
+                                      (right, bottom), (left, bottom)])
+            count += 1
+
+        return count
+
+    def _DrawPolygons(self, layer, rows, copper):
+        X, x0, y0 = self._PixelOrigin()
+        count = 0
+
+        for outline in BitmapImage.StaircasePolygons(rows):
+            points = [(x0 + x * X, y0 + y * X) for x, y in outline]
+
+            if copper:
+                # custom pad anchored on the outline's top left pixel
+                ax, ay = points[0]
+                anchor = pcbnew.wxPoint(ax + X // 2, ay + X // 2)
+                pad = self._CopperPad(layer)
+                pad.SetShape(pcbnew.PAD_SHAPE_CUSTOM)
+                pad.SetAnchorPadShape(pcbnew.PAD_SHAPE_RECT)
+                pad.SetSize(pcbnew.wxSize(X, X))
+                pad.SetPosition(anchor)
+                pad.AddPrimitive(pcbnew.wxPoint_Vector(
+                    [pcbnew.wxPoint(x - anchor.x, y - anchor.y)
+                     for x, y in points]), 0)
+                self.module.Add(pad)
+            else:
+                self._Polygon(layer, points)
+            count += 1
+
+        return count
+
+    def BuildThisFootprint(self):
+        image = self.parameters['Image']
+        output = self.parameters['Output']
+
+        layer = self.LAYERS[output['Layer']]
+        copper = layer in (pcbnew.F_Cu, pcbnew.B_Cu)
+
+        # percent of full scale to a grey level
+        threshold = image['Threshold'] * 256 / 100
+        rows = self.image.Rows(threshold, image['Negative'])
+
+        if output['Shape'] == 'polygons':
+            count = self._DrawPolygons(layer, rows, copper)
+        else:
+            count = self._DrawRectangles(layer, rows, copper)
+
+        self.buildmessages += "Image: %d x %d pixels, %d %s\n" % (
+            self.image.width, self.image.height, count, output['Shape'])
+
+        if copper:
+            self.module.SetAttributes(pcbnew.MOD_CMS)
+
+        # Value above, reference below the image
+        X = image['Pixel Width']
+        text_size = self.GetTextSize()
+        text_offset = int(self.image.height * X / 2) + text_size
+
+        self.draw.SetLayer(pcbnew.F_Fab)
+        self.draw.Value(0, -text_offset, text_size)
+        self.draw.Reference(0, text_offset, text_size)
+
+BitmapWizard().register()
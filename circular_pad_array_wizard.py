@@ -24,6 +24,8 @@ import PadArray as PA
 
 class circular_pad_array_wizard(FootprintWizardBase.FootprintWizard):
 
+    checkClearances = True
+
     def GetName(self):
         return "Circular Pad Array"
 
@@ -47,6 +49,14 @@ class circular_pad_array_wizard(FootprintWizardBase.FootprintWizard):
         #self.AddParam("Numbering", "increment", self.uInteger, 1, min_value=1)
         self.AddParam("Numbering", "clockwise", self.uBool, True)
 
+        # further rings outside the first one, each one "pitch" larger in
+        # diameter than the previous
+        self.AddParam("Rings", "count", self.uInteger, 1, min_value=1)
+        self.AddParam("Rings", "pitch", self.uMM, 2.5, min_value=0, hint="Centre diameter increase per ring")
+        self.AddParam("Rings", "pad increment", self.uInteger, 0, min_value=0, hint="Extra pads per ring")
+        self.AddParam("Rings", "angle step", self.uDegrees, 0, hint="Angle offset increase per ring")
+        self.AddParam("Rings", "alternate direction", self.uBool, False, hint="Reverse the numbering direction on every other ring")
+
         self.AddParam("Outline", "diameter", self.uMM, 7, designator='D')
         self.AddParam("Outline", "margin", self.uMM, 0.25, min_value=0.2)
 
@@ -57,21 +67,35 @@ class circular_pad_array_wizard(FootprintWizardBase.FootprintWizard):
         outline = self.parameters['Outline']
         padRotation = self.parameters['Pad rotation']
 
-        # Check that pads do not overlap
+        # Check that pads do not overlap, with the exact minimum spacing
+        # over all the rings
         pad_dia = pcbnew.ToMM(pads['diameter'])
-        centres = pcbnew.ToMM(pads['center diameter'])
-        n_pads = pads['count']
+        rings = self.GetRings()
+        spacing = PA.PadConcentricArray.MinimumSpacing(rings)
 
-        self.CheckParam('Pads','diameter',max_value=centres*math.pi/n_pads,info="Pads overlap")
+        if spacing is not None and pad_dia > pcbnew.ToMM(spacing):
+            self.GetParam('Pads', 'diameter').AddError(
+                "Pads overlap", "max %g" % pcbnew.ToMM(spacing))
 
         # Check that the pads fit inside the outline
-        d_min = pad_dia + centres
+        d_min = pad_dia + 2 * pcbnew.ToMM(max(ring[1] for ring in rings))
 
         self.CheckParam("Outline","diameter",min_value=d_min, info="Outline diameter is too small")
 
+    # the (n, r, angle_offset, clockwise) of every ring
+    def GetRings(self):
+        pads = self.parameters['Pads']
+        numbering = self.parameters['Numbering']
+        rings = self.parameters['Rings']
+
+        return [(pads['count'] + k * rings['pad increment'],
+                 (pads['center diameter'] + k * rings['pitch']) / 2,
+                 pads['angle'] + k * rings['angle step'],
+                 numbering['clockwise'] != (rings['alternate direction'] and k % 2 == 1))
+                for k in range(rings['count'])]
 
     def GetValue(self):
-        pins = self.parameters["Pads"]["count"]
+        pins = sum(ring[0] for ring in self.GetRings())
         return "CPA_%d" % pins
 
     def BuildThisFootprint(self):
@@ -86,11 +110,9 @@ class circular_pad_array_wizard(FootprintWizardBase.FootprintWizard):
 
         pad = PA.PadMaker(self.module).THPad(pads['diameter'], pads['diameter'], pads['drill'], shape=pad_shape)
 
-        array = PA.PadCircleArray(
-            pad, pads['count'], pads['center diameter'] / 2,
-            angle_offset=pads["angle"],
+        array = PA.PadConcentricArray(
+            pad, self.GetRings(),
             centre=pcbnew.wxPoint(0, 0),
-            clockwise=numbering["clockwise"],
             padRotationEnable= padRotation["pad rotation"],
             padRotationOffset = padRotation["pad angle offset"])
 
@@ -20,68 +20,10 @@ import pcbnew
 import FootprintWizardBase as FPWbase
 import PadArray as PA
 
-class PadStaggeredZGridArray(PA.PadArray):
-    """ Creates a staggered array of Pads with Z pad naming
-
-                | pad pitch
-                |   |
-                o   o   o   o     ----
-    staggered --> o   o   o   o   -- line_pitch
-    line        o   o   o   o
-                  o   o   o   o
-    """
-    def __init__(self, aPad, aPadCount, aLineCount, aLinePitch,
-                 aPadPitch, aStagger=0, aCentre=pcbnew.wxPoint(0, 0)):
-        """
-        @param aPad         Template for all pads
-        @param aPadCount    Overall pad count
-        @param aLineCount   Number of lines
-        @param aLinePitch   distance between lines
-        @param aPadPitch    distance between pads
-        @param aStagger     X stagger value for all odd lines
-        @param aCentre      Center position
-
-        """
-        super(PadStaggeredZGridArray, self).__init__(aPad)
-
-        self.padCount = int(aPadCount)
-        self.lineCount = int(aLineCount)
-        self.linePitch = aLinePitch
-        self.padPitch = aPadPitch
-        self.stagger = aStagger
-        self.centre = aCentre
-
-
-    # right to left, top to bottom
-    def NamingFunction(self, aPadPos):
-        return self.firstPadNum + aPadPos
-
-    #relocate the pad and add it as many times as we need
-    def AddPadsToModule(self, dc):
-        pin1posX = self.centre.x - ((self.padPitch * (self.padCount // 2 - 1)) + self.stagger) / 2
-        pin1posY = self.centre.y - self.linePitch * (self.lineCount - 1) / 2
-        line = 0
-
-        for padnum in range(0, self.padCount):
-            if (line % 2) == 0:
-                posX = pin1posX + ((padnum // 2) * self.padPitch)
-            else:
-                posX = pin1posX + self.stagger + ((padnum // 2) * self.padPitch)
-
-            posY = pin1posY + (self.linePitch * line)
-
-            pos = dc.TransformPoint(posX, posY)
-            pad = self.GetPad(padnum == 0, pos)
-            pad.SetName(self.GetName(padnum))
-            self.AddPad(pad)
-
-            line += 1
-
-            if line >= self.lineCount:
-                line = 0
-
-
 class MicroMaTchWizard(FPWbase.FootprintWizard):
+
+    recordGraphics = True
+    clipSilkscreen = True
     padCountKey           = 'pad count'
     rowSpacingKey         = 'row spacing'
     padLengthKey          = 'pad length'
@@ -141,7 +83,9 @@ class MicroMaTchWizard(FPWbase.FootprintWizard):
         # add in the pads
         pad = self.GetPad()
 
-        array = PadStaggeredZGridArray(pad, numPads, numRows, rowPitch, padPitch, staggerOffset)
+        # two rows with Z pad naming, the odd row staggered in x
+        array = PA.PadLatticeArray(pad, numPads, numRows, (padPitch, 0),
+                                   (0, rowPitch), stagger=(staggerOffset, 0))
         array.AddPadsToModule(self.draw)
 
         # Draw connector outlineChassis
@@ -180,20 +124,13 @@ class MicroMaTchWizard(FPWbase.FootprintWizard):
                                 (width/2,                                      height/2),
                                 (width/2 - pcbnew.FromMM(0.5),                 height/2)])
 
-        # Courtyard
-        self.draw.SetLayer(pcbnew.F_CrtYd)
-        self.draw.SetLineThickness(pcbnew.FromMM(0.05))
-        boxW = width                + pcbnew.FromMM(0.5)
-        boxH = rowPitch + padLength + pcbnew.FromMM(0.5)
-
-        # Round courtyard positions to 0.1 mm, rectangle will thus land on a 0.05mm grid
-        pcbnew.PutOnGridMM(boxW, pcbnew.FromMM(0.10))
-        pcbnew.PutOnGridMM(boxH, pcbnew.FromMM(0.10))
-        self.draw.Box(0,0, boxW, boxH)
+        # Courtyard around the pads and the silkscreen body outline
+        left, top, right, bottom = self.draw.AutoCourtyard(
+            pcbnew.FromMM(0.25), layers=(pcbnew.F_SilkS,))
 
         #reference and value
         text_size = pcbnew.FromMM(1.0)  # According KLC
-        text_offset = boxH/2 + text_size
+        text_offset = max(-top, bottom) + text_size
 
         self.draw.Value(0, text_offset, text_size)
         self.draw.Reference(0, -text_offset, text_size)
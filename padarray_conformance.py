@@ -0,0 +1,192 @@
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+"""
+Conformance check of the pad lattice against the old Z-grid rules
+
+PadZGridArray (zip_wizard) and the staggered two row lattice of the
+microMatch wizard used to have their own position and naming loops.
+Both are now PadLatticeArray, and this script compares their
+GetPositions() and pad names against those old rules, restated here,
+for a range of pad counts, line counts, pitches, staggers and centres.
+
+    python padarray_conformance.py           # run the check
+
+pcbnew is not needed: when it cannot be imported, a minimal stand-in
+providing the names PadArray uses at import time is put in its place,
+as only the pad positions and names are looked at.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import itertools
+import os
+import sys
+import types
+
+# positions are compared to within this many internal units
+TOLERANCE = 1e-6
+
+
+class _Point(object):
+    """!
+    Stand-in for pcbnew.wxPoint, with only the x and y members
+    """
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def _ImportPadArray():
+    """!
+    Import PadArray, standing in for pcbnew if it is not available
+    """
+    try:
+        import pcbnew
+    except ImportError:
+        pcbnew = types.ModuleType('pcbnew')
+        pcbnew.wxPoint = _Point
+        pcbnew.PAD_SHAPE_OVAL = 'oval'
+        pcbnew.PAD_SHAPE_RECT = 'rect'
+        sys.modules['pcbnew'] = pcbnew
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import PadArray
+    return PadArray, pcbnew.wxPoint
+
+
+def OldZGrid(pad_count, line_count, line_pitch, pad_pitch, centre):
+    """!
+    The pad centres of the old PadZGridArray: pads advance one pad
+    pitch each, cycling up through the lines from the bottom one
+
+    @return list of (x, y), in pad number order
+    """
+    pin1posX = centre.x - pad_pitch * (pad_count - 1) / 2
+    pin1posY = centre.y + line_pitch * (line_count - 1) / 2
+
+    positions = []
+    for padnum in range(pad_count):
+        line = padnum % line_count
+        positions.append((pin1posX + padnum * pad_pitch,
+                          pin1posY - line_pitch * line))
+    return positions
+
+
+def OldStaggeredZGrid(pad_count, line_count, line_pitch, pad_pitch,
+                      stagger, centre):
+    """!
+    The pad centres of the old microMatch PadStaggeredZGridArray: pads
+    alternate between the lines, the odd lines shifted by the stagger
+
+    @return list of (x, y), in pad number order
+    """
+    pin1posX = centre.x - ((pad_pitch * (pad_count // 2 - 1)) + stagger) / 2
+    pin1posY = centre.y - line_pitch * (line_count - 1) / 2
+
+    positions = []
+    for padnum in range(pad_count):
+        line = padnum % line_count
+        posX = pin1posX + ((padnum // 2) * pad_pitch)
+        if line % 2:
+            posX += stagger
+        positions.append((posX, pin1posY + (line_pitch * line)))
+    return positions
+
+
+def _Compare(label, array, expected, first_pad):
+    """!
+    Compare an array's positions and names with the expected positions,
+    the names running up from first_pad
+
+    @return the number of failures, 0 or 1
+    """
+    array.SetFirstPadInArray(first_pad)
+    got = array.GetPositions()
+
+    if len(got) != len(expected):
+        print('%s: %d pads, expected %d' % (label, len(got), len(expected)))
+        return 1
+
+    for n, ((x, y), (ex, ey)) in enumerate(zip(got, expected)):
+        if abs(x - ex) > TOLERANCE or abs(y - ey) > TOLERANCE:
+            print('%s: pad index %d at (%r, %r), expected (%r, %r)' % (
+                label, n, x, y, ex, ey))
+            return 1
+
+        name = array.GetName(n)
+        if name != first_pad + n:
+            print('%s: pad index %d named %r, expected %r' % (
+                label, n, name, first_pad + n))
+            return 1
+
+    return 0
+
+
+def Check(PA, wxPoint):
+    """!
+    Run both comparisons over the parameter ranges
+
+    @return the number of failures
+    """
+    centres = [wxPoint(0, 0), wxPoint(1500000, -2540000)]
+    pitches = [1000000, 1270000, 2540000]
+    first_pads = [1, 0, 10]
+
+    checked = failures = 0
+
+    for pad_count, line_count, line_pitch, pad_pitch, centre, first in \
+            itertools.product(range(1, 25), range(1, 5), pitches, pitches,
+                              centres, first_pads):
+        label = 'PadZGridArray(%d, %d, %d, %d) at (%d, %d), first %d' % (
+            pad_count, line_count, line_pitch, pad_pitch,
+            centre.x, centre.y, first)
+        array = PA.PadZGridArray(None, pad_count, line_count, line_pitch,
+                                 pad_pitch, centre=centre)
+        expected = OldZGrid(pad_count, line_count, line_pitch, pad_pitch,
+                            centre)
+        failures += _Compare(label, array, expected, first)
+        checked += 1
+
+    # the microMatch wizard: an even pad count over two lines
+    staggers = [0, 1270000, -635000]
+
+    for pad_count, line_pitch, pad_pitch, stagger, centre, first in \
+            itertools.product(range(2, 41, 2), [5200000] + pitches, pitches,
+                              staggers, centres, first_pads):
+        label = 'microMatch(%d, %d, %d, %d) at (%d, %d), first %d' % (
+            pad_count, line_pitch, pad_pitch, stagger,
+            centre.x, centre.y, first)
+        array = PA.PadLatticeArray(None, pad_count, 2, (pad_pitch, 0),
+                                   (0, line_pitch), stagger=(stagger, 0),
+                                   centre=centre)
+        expected = OldStaggeredZGrid(pad_count, 2, line_pitch, pad_pitch,
+                                     stagger, centre)
+        failures += _Compare(label, array, expected, first)
+        checked += 1
+
+    print('%d combinations checked, %d failures' % (checked, failures))
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.parse_args()
+
+    PA, wxPoint = _ImportPadArray()
+    sys.exit(1 if Check(PA, wxPoint) else 0)
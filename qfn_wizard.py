@@ -23,6 +23,10 @@ import PadArray as PA
 
 class QFNWizard(FootprintWizardBase.FootprintWizard):
 
+    recordGraphics = True
+    clipSilkscreen = True
+    checkClearances = True
+
     def GetName(self):
         return "QFN"
 
@@ -31,9 +35,8 @@ class QFNWizard(FootprintWizardBase.FootprintWizard):
 
     def GenerateParameterList(self):
 
-        #TODO - Allow different number of pads in x and y directions
-
-        self.AddParam("Pads", "n", self.uInteger, 100, multiple=4, min_value=4)
+        self.AddParam("Pads", "nx", self.uInteger, 25, min_value=1, hint="Number of pads on the top and bottom sides")
+        self.AddParam("Pads", "ny", self.uInteger, 25, min_value=1, hint="Number of pads on the left and right sides")
         self.AddParam("Pads", "pitch", self.uMM, 0.5, designator='e')
         self.AddParam("Pads", "width", self.uMM, 0.25, designator='X1')
         self.AddParam("Pads", "length", self.uMM, 1.5, designator='Y1')
@@ -45,9 +48,11 @@ class QFNWizard(FootprintWizardBase.FootprintWizard):
         self.AddParam("EPad", "length", self.uMM, 10, designator="D2")
         self.AddParam("EPad", "thermal vias", self.uBool, False)
         self.AddParam("EPad", "thermal vias drill", self.uMM, 1, min_value=0.1)
+        self.AddParam("EPad", "thermal vias annular ring", self.uMM, 0.15, min_value=0.05)
         self.AddParam("EPad", "x divisions", self.uInteger, 2, min_value=1)
         self.AddParam("EPad", "y divisions", self.uInteger, 2, min_value=1)
-        self.AddParam("EPad", "paste margin", self.uMM, 0.1)
+        self.AddParam("EPad", "paste coverage", self.uPercent, 50, min_value=0, max_value=100)
+        self.AddParam("EPad", "paste margin", self.uMM, 0.1, hint="Paste clearance to the pane edges and vias")
 
         self.AddParam("Package", "width", self.uMM, 14, designator='E')
         self.AddParam("Package", "height", self.uMM, 14, designator='D')
@@ -65,13 +70,27 @@ class QFNWizard(FootprintWizardBase.FootprintWizard):
     def package(self):
         return self.parameters['Package']
 
+    @property
+    def pad_count(self):
+        return 2 * (self.pads['nx'] + self.pads['ny'])
+
     def CheckParameters(self):
-        pass
+
+        if self.epad['epad'] and self.epad['thermal vias']:
+            # each via must fit in its tile
+            tile = min(self.epad['width'] / self.epad['x divisions'],
+                       self.epad['length'] / self.epad['y divisions'])
+            via_diam = self.epad['thermal vias drill'] + 2 * self.epad['thermal vias annular ring']
+
+            if via_diam >= tile:
+                self.GetParam('EPad', 'thermal vias drill').AddError(
+                    "Thermal vias do not fit the divisions",
+                    "via diameter {d:g}mm".format(d=pcbnew.ToMM(via_diam)))
 
     def GetValue(self):
 
         return "QFN-{n}_{ep}{x:g}x{y:g}_Pitch{p:g}mm".format(
-                n = self.pads['n'],
+                n = self.pad_count,
                 ep = "EP_" if self.epad['epad'] else '',
                 x = pcbnew.ToMM(self.package['width']),
                 y = pcbnew.ToMM(self.package['height']),
@@ -89,93 +108,61 @@ class QFNWizard(FootprintWizardBase.FootprintWizard):
         v_pitch = self.package["height"]
         h_pitch = self.package["width"]
 
-        pads_per_row = int(self.pads["n"] // 4)
+        pads_x = self.pads["nx"]
+        pads_y = self.pads["ny"]
 
-        row_len = (pads_per_row - 1) * pad_pitch
 
         pad_shape = pcbnew.PAD_SHAPE_OVAL if self.pads["oval"] else pcbnew.PAD_SHAPE_RECT
 
-        h_pad = PA.PadMaker(self.module).SMDPad( pad_length + pad_fillet, pad_width,
-                                                 shape=pad_shape, rot_degree=90.0)
-        v_pad = PA.PadMaker(self.module).SMDPad( pad_length + pad_fillet, pad_width, shape=pad_shape)
+        pad = PA.PadMaker(self.module).SMDPad( pad_length + pad_fillet, pad_width, shape=pad_shape)
 
         h_pitch = h_pitch / 2 - pad_length + (pad_length+pad_fillet)/2
         v_pitch = v_pitch / 2 - pad_length + (pad_length+pad_fillet)/2
 
-        #left row
-        pin1Pos = pcbnew.wxPoint(-h_pitch, 0)
-        array = PA.PadLineArray(h_pad, pads_per_row, pad_pitch, True, pin1Pos)
+        array = PA.PadQuadArray(pad, pads_x, pads_y, pad_pitch,
+                                2 * h_pitch, 2 * v_pitch)
         array.SetFirstPadInArray(1)
         array.AddPadsToModule(self.draw)
 
-        #bottom row
-        pin1Pos = pcbnew.wxPoint(0, v_pitch)
-        array = PA.PadLineArray(v_pad, pads_per_row, pad_pitch, False, pin1Pos)
-        array.SetFirstPadInArray(pads_per_row + 1)
-        array.AddPadsToModule(self.draw)
-
-        #right row
-        pin1Pos = pcbnew.wxPoint(h_pitch, 0)
-        array = PA.PadLineArray(h_pad, pads_per_row, -pad_pitch, True,
-                                pin1Pos)
-        array.SetFirstPadInArray(2*pads_per_row + 1)
-        array.AddPadsToModule(self.draw)
-
-        #top row
-        pin1Pos = pcbnew.wxPoint(0, -v_pitch)
-        array = PA.PadLineArray(v_pad, pads_per_row, -pad_pitch, False,
-                                pin1Pos)
-        array.SetFirstPadInArray(3*pads_per_row + 1)
-        array.AddPadsToModule(self.draw)
-
         lim_x = self.package["width"] / 2
         lim_y = self.package["height"] / 2
-        inner = (row_len / 2) + pad_pitch
 
         # epad
         epad_width   = self.epad["width"]
         epad_length  = self.epad["length"]
 
-        epad_ny = self.epad["x divisions"]
-        epad_nx = self.epad["y divisions"]
-
-        epad_via_drill = self.epad["thermal vias drill"]
+        epad_nx = self.epad["x divisions"]
+        epad_ny = self.epad["y divisions"]
 
         # Create a central exposed pad?
         if self.epad['epad'] == True:
 
-            epad_num = self.pads['n'] + 1
-
-            epad_w = epad_length / epad_nx
-            epad_l = epad_width / epad_ny
+            epad_num = self.pad_count + 1
 
-            # Create the epad
-            epad = PA.PadMaker(self.module).SMDPad( epad_w, epad_l, shape=pcbnew.PAD_SHAPE_RECT )
-            epad.SetLocalSolderPasteMargin( -1 * self.epad['paste margin'] )
-            # set pad layers
-            layers = pcbnew.LSET(pcbnew.F_Mask)
-            layers.AddLayer(pcbnew.F_Cu)
-            layers.AddLayer(pcbnew.F_Paste)
-            epad.SetName(epad_num)
-
-            array = PA.EPADGridArray( epad, epad_ny, epad_nx, epad_l, epad_w, pcbnew.wxPoint(0,0) )
-            array.SetFirstPadInArray(epad_num)
-            array.AddPadsToModule(self.draw)
+            # Create the epad: the engine makes the copper, paste and vias
+            epad = PA.PadMaker(self.module).SMDPad( epad_length, epad_width, shape=pcbnew.PAD_SHAPE_RECT )
 
+            via = None
             if self.epad['thermal vias']:
 
                 # create the thermal via
-                via_diam = min(epad_w, epad_l) / 2
-                via_drill = min(via_diam / 2, epad_via_drill)
+                via_drill = self.epad["thermal vias drill"]
+                via_diam = via_drill + 2 * self.epad["thermal vias annular ring"]
                 via = PA.PadMaker(self.module).THRoundPad(via_diam, via_drill)
                 layers = pcbnew.LSET.AllCuMask()
                 layers.AddLayer(pcbnew.B_Mask)
                 layers.AddLayer(pcbnew.F_Mask)
                 via.SetLayerSet(layers)
 
-                via_array = PA.EPADGridArray(via, epad_ny, epad_nx, epad_l, epad_w, pcbnew.wxPoint(0,0) )
-                via_array.SetFirstPadInArray(epad_num)
-                via_array.AddPadsToModule(self.draw)
+            array = PA.ExposedPadArray(epad, epad_nx, epad_ny,
+                                       coverage=self.epad['paste coverage'] / 100,
+                                       paste_margin=self.epad['paste margin'],
+                                       via=via, centre=pcbnew.wxPoint(0,0))
+            array.SetFirstPadInArray(epad_num)
+            array.AddPadsToModule(self.draw)
+
+            self.buildmessages += "EPad paste coverage: {c:.1f}%\n".format(
+                c=array.achievedCoverage * 100)
 
         # Draw the package outline on the F.Fab layer
         bevel = min( pcbnew.FromMM(1.0), self.package['width']/2, self.package['height']/2 )
@@ -191,31 +178,17 @@ class QFNWizard(FootprintWizardBase.FootprintWizard):
         self.draw.SetLayer(pcbnew.F_SilkS)
 
         offset = self.draw.GetLineThickness()
-        clip = row_len / 2 + self.pads['pitch']
-
-        self.draw.Polyline( [ [ clip, -h/2-offset], [ w/2+offset,-h/2-offset], [ w/2+offset, -clip] ] ) # top right
-        self.draw.Polyline( [ [ clip,  h/2+offset], [ w/2+offset, h/2+offset], [ w/2+offset,  clip] ] ) # bottom right
-        self.draw.Polyline( [ [-clip,  h/2+offset], [-w/2-offset, h/2+offset], [-w/2-offset,  clip] ] ) # bottom left
-
-        # Add pin-1 indication as per IPC-7351C
-        self.draw.Line(-clip, -h/2-offset, -w/2-pad_length/2, -h/2-offset)
-
-        # Courtyard
-        cmargin = self.package["margin"]
-        self.draw.SetLayer(pcbnew.F_CrtYd)
-
-        sizex = (lim_x + cmargin) * 2 + pad_length
-        sizey = (lim_y + cmargin) * 2 + pad_length
-
-        # round size to nearest 0.1mm, rectangle will thus land on a 0.05mm grid
-        sizex = pcbnew.PutOnGridMM(sizex, 0.1)
-        sizey = pcbnew.PutOnGridMM(sizey, 0.1)
-        # set courtyard line thickness to the one defined in KLC
-        thick = self.draw.GetLineThickness()
-        self.draw.SetLineThickness(pcbnew.FromMM(0.05))
-        self.draw.Box(0, 0, sizex, sizey)
-        # restore line thickness to previous value
-        self.draw.SetLineThickness(pcbnew.FromMM(thick))
+        x = w/2 + offset
+        y = h/2 + offset
+
+        # the outline is cut back from the pads when the silkscreen is
+        # clipped, leaving the corners. There is no top left corner: the
+        # top side runs on past it as the pin-1 indication (IPC-7351C)
+        self.draw.Polyline([(-w/2 - pad_length/2, -y), (x, -y), (x, y),
+                            (-x, y), (-x, 0)])
+
+        # Courtyard around the pads and the F.Fab outline
+        self.draw.AutoCourtyard(self.package["margin"])
 
         #reference and value
         text_size = self.GetTextSize()  # IPC nominal
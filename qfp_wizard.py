@@ -22,6 +22,9 @@ import PadArray as PA
 
 class QFPWizard(FootprintWizardBase.FootprintWizard):
 
+    recordGraphics = True
+    clipSilkscreen = True
+
     def GetName(self):
         return "QFP"
 
@@ -76,36 +79,13 @@ class QFPWizard(FootprintWizardBase.FootprintWizard):
 
         pad_shape = pcbnew.PAD_SHAPE_OVAL if self.pads["oval"] else pcbnew.PAD_SHAPE_RECT
 
-        h_pad = PA.PadMaker(self.module).SMDPad( pad_length, pad_width,
-                                                 shape=pad_shape, rot_degree=90.0)
-        v_pad = PA.PadMaker(self.module).SMDPad( pad_length, pad_width, shape=pad_shape)
+        pad = PA.PadMaker(self.module).SMDPad( pad_length, pad_width, shape=pad_shape)
 
-        #left row
-        pin1Pos = pcbnew.wxPoint(-h_pitch / 2, 0)
-        array = PA.PadLineArray(h_pad, pads_per_row, pad_pitch, True, pin1Pos)
+        array = PA.PadQuadArray(pad, pads_per_row, pads_per_row, pad_pitch,
+                                h_pitch, v_pitch)
         array.SetFirstPadInArray(1)
         array.AddPadsToModule(self.draw)
 
-        #bottom row
-        pin1Pos = pcbnew.wxPoint(0, v_pitch / 2)
-        array = PA.PadLineArray(v_pad, pads_per_row, pad_pitch, False, pin1Pos)
-        array.SetFirstPadInArray(pads_per_row + 1)
-        array.AddPadsToModule(self.draw)
-
-        #right row
-        pin1Pos = pcbnew.wxPoint(h_pitch / 2, 0)
-        array = PA.PadLineArray(h_pad, pads_per_row, -pad_pitch, True,
-                                pin1Pos)
-        array.SetFirstPadInArray(2*pads_per_row + 1)
-        array.AddPadsToModule(self.draw)
-
-        #top row
-        pin1Pos = pcbnew.wxPoint(0, -v_pitch / 2)
-        array = PA.PadLineArray(v_pad, pads_per_row, -pad_pitch, False,
-                                pin1Pos)
-        array.SetFirstPadInArray(3*pads_per_row + 1)
-        array.AddPadsToModule(self.draw)
-
         offset = pcbnew.FromMM(0.15)
 
         x = self.parameters["Package"]["width"] / 2 + offset
@@ -132,29 +112,14 @@ class QFPWizard(FootprintWizardBase.FootprintWizard):
         # Draw silkscreen
         self.draw.SetLayer(pcbnew.F_SilkS)
 
-        #top left - as per IPC-7351C
-        self.draw.Polyline([(-inner, -y), (-x, -y), (-x, -inner), (left_edge, -inner)])
-        # top right
-        self.draw.Polyline([(inner, -y), (x, -y), (x, -inner)])
-        # bottom left
-        self.draw.Polyline([(-inner, y), (-x, y), (-x, inner)])
-        # bottom right
-        self.draw.Polyline([(inner, y), (x, y), (x, inner)])
-
-        # Courtyard
-        cmargin = self.parameters["Package"]["courtyard margin"]
-        self.draw.SetLayer(pcbnew.F_CrtYd)
-        sizex = (right_edge + cmargin) * 2
-        sizey = (bottom_edge + cmargin) * 2
-        # round size to nearest 0.1mm, rectangle will thus land on a 0.05mm grid
-        sizex = pcbnew.PutOnGridMM(sizex, 0.1)
-        sizey = pcbnew.PutOnGridMM(sizey, 0.1)
-        # set courtyard line thickness to the one defined in KLC
-        thick = self.draw.GetLineThickness()
-        self.draw.SetLineThickness(pcbnew.FromMM(0.05))
-        self.draw.Box(0, 0, sizex, sizey)
-        # restore line thickness to previous value
-        self.draw.SetLineThickness(pcbnew.FromMM(thick))
+        # the outline is cut back from the pads when the silkscreen is
+        # clipped, leaving the corners; the pin 1 mark runs out above the
+        # first pad, as per IPC-7351C
+        self.draw.Polyline([(left_edge, -inner), (-x, -inner), (-x, -y),
+                            (x, -y), (x, y), (-x, y), (-x, 0)])
+
+        # Courtyard around the pads and the F.Fab outline
+        self.draw.AutoCourtyard(self.parameters["Package"]["courtyard margin"])
 
         #reference and value
         text_size = self.GetTextSize()  # IPC nominal
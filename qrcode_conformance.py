@@ -0,0 +1,272 @@
+#  This program is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 2 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+#  MA 02110-1301, USA.
+
+"""
+Exact-output conformance suite and benchmark for the QR encoder
+
+Every (version, error correction level, mask pattern) combination the
+encoder tables support is encoded for a fixed corpus, and the module
+bitmap is compared against the frozen digests in qrcode_golden.txt.
+
+    python qrcode_conformance.py             # check against the golden file
+    python qrcode_conformance.py --update    # re-freeze the golden file
+    python qrcode_conformance.py --bench     # time the encoder hot paths
+
+Use --module kicad_qrcode to run against the copy used by the wizard.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import hashlib
+import importlib
+import os
+import sys
+import timeit
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'qrcode_golden.txt')
+
+# Fixed corpus: 'short' leaves most of the symbol to the pad codewords,
+# 'full' fills the 8-bit byte capacity of every version/level
+CORPUS_SHORT = 'KiCad QR'
+CORPUS_TEXT = ('The quick brown fox jumps over the lazy dog. '
+               '0123456789 !#$%&()*+,-./:;<=>?@[]^_{|}~ ')
+
+LEVEL_NAMES = ['L', 'M', 'Q', 'H']
+
+
+def Levels(qr):
+    """!
+    The error correction levels, in L, M, Q, H order
+    """
+    return [getattr(qr.ErrorCorrectLevel, name) for name in LEVEL_NAMES]
+
+
+def Versions(qr):
+    """!
+    The type numbers (versions) the encoder tables provide RS blocks for
+    """
+    return range(1, len(qr.RSBlock.RS_BLOCK_TABLE) // 4 + 1)
+
+
+def CorpusData(qr, corpus, version, level):
+    """!
+    The corpus string to encode for a given version and level
+    """
+    length = qr.QRUtil.getMaxLength(version, qr.Mode.MODE_8BIT_BYTE, level)
+
+    if corpus == 'short':
+        return CORPUS_SHORT[:length]
+
+    text = CORPUS_TEXT * (length // len(CORPUS_TEXT) + 1)
+    return text[:length]
+
+
+def Encode(qr, data, version, level, mask):
+    """!
+    Encode data with a forced mask pattern and return the QRCode object
+    """
+    code = qr.QRCode()
+    code.setTypeNumber(version)
+    code.setErrorCorrectLevel(level)
+    code.addData(data)
+    code._make(False, mask)
+    return code
+
+
+def BitmapDigest(code):
+    """!
+    SHA-1 of the module bitmap, packed 8 modules to a byte, row by row
+    """
+    packed = bytearray()
+    for row in code.modules:
+        for i in range(0, len(row), 8):
+            byte = 0
+            for dark in row[i:i + 8]:
+                byte = (byte << 1) | (1 if dark else 0)
+            packed.append(byte)
+    return hashlib.sha1(bytes(packed)).hexdigest()
+
+
+def GenerateDigests(qr):
+    """!
+    Yield (key, digest) for every corpus/version/level/mask combination
+    """
+    for corpus in ('short', 'full'):
+        for version in Versions(qr):
+            for name, level in zip(LEVEL_NAMES, Levels(qr)):
+                data = CorpusData(qr, corpus, version, level)
+                for mask in range(8):
+                    code = Encode(qr, data, version, level, mask)
+                    key = (corpus, version, name, mask)
+                    yield key, BitmapDigest(code)
+
+
+def ReadGolden(path):
+    golden = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            corpus, version, level, mask, digest = line.split()
+            golden[(corpus, int(version), level, int(mask))] = digest
+    return golden
+
+
+def WriteGolden(path, digests):
+    with open(path, 'w') as f:
+        f.write('# QR encoder golden module bitmaps, see qrcode_conformance.py\n')
+        f.write('# corpus version level mask sha1\n')
+        for key, digest in digests:
+            f.write('%s %d %s %d %s\n' % (key + (digest,)))
+
+
+def Check(qr, path):
+    """!
+    Compare the encoder output against the golden file
+
+    @return the number of mismatching or missing combinations
+    """
+    golden = ReadGolden(path)
+    failures = 0
+    checked = 0
+
+    for key, digest in GenerateDigests(qr):
+        checked += 1
+        expected = golden.get(key)
+        if expected is None:
+            print('MISSING  %s v%d-%s mask %d' % key)
+            failures += 1
+        elif expected != digest:
+            print('MISMATCH %s v%d-%s mask %d' % key)
+            failures += 1
+
+    print('%d combinations checked, %d failures' % (checked, failures))
+    return failures
+
+
+def _Time(func, min_time=0.2):
+    """!
+    Call func repeatedly for at least min_time seconds
+
+    @return the mean time per call in seconds
+    """
+    timer = timeit.default_timer
+    count = 0
+    start = timer()
+    elapsed = 0
+    while elapsed < min_time:
+        func()
+        count += 1
+        elapsed = timer() - start
+    return elapsed / count
+
+
+def _Template(code, mask):
+    """!
+    The module matrix with only the function patterns placed, i.e. the
+    state _make() hands to _mapData()
+    """
+    count = code.typeNumber * 4 + 17
+    code.moduleCount = count
+    code.modules = [[None] * count for i in range(count)]
+    code._setupPositionProbePattern(0, 0)
+    code._setupPositionProbePattern(count - 7, 0)
+    code._setupPositionProbePattern(0, count - 7)
+    code._setupPositionAdjustPattern()
+    code._setupTimingPattern()
+    code._setupTypeInfo(True, mask)
+    if code.typeNumber >= 7:
+        code._setupTypeNumber(True)
+    return [row[:] for row in code.modules]
+
+
+def Bench(qr, min_time):
+    """!
+    Time make(), _createData, getLostPoint and _mapData per version, at
+    level M with the capacity-filling corpus
+    """
+    level = qr.ErrorCorrectLevel.M
+
+    print('%7s %12s %14s %14s %14s' % (
+        'version', 'make codes/s', '_createData us', 'getLostPoint us',
+        '_mapData us'))
+
+    for version in Versions(qr):
+        data = CorpusData(qr, 'full', version, level)
+
+        def make():
+            code = qr.QRCode()
+            code.setTypeNumber(version)
+            code.setErrorCorrectLevel(level)
+            code.addData(data)
+            code.make()
+
+        code = Encode(qr, data, version, level, 0)
+        data_list = code.qrDataList
+
+        def create_data():
+            qr.QRCode._createData(version, level, data_list)
+
+        def lost_point():
+            qr.QRUtil.getLostPoint(code)
+
+        codewords = qr.QRCode._createData(version, level, data_list)
+        mapper = qr.QRCode()
+        mapper.setTypeNumber(version)
+        mapper.setErrorCorrectLevel(level)
+        mapper.addData(data)
+        template = _Template(mapper, 0)
+
+        def map_data():
+            mapper.modules = [row[:] for row in template]
+            mapper._mapData(codewords, 0)
+
+        t_make = _Time(make, min_time)
+        t_create = _Time(create_data, min_time)
+        t_lost = _Time(lost_point, min_time)
+        t_map = _Time(map_data, min_time)
+
+        print('%7d %12.1f %14.1f %14.1f %14.1f' % (
+            version, 1 / t_make, t_create * 1e6, t_lost * 1e6, t_map * 1e6))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--module', default='qrcode',
+                        help='encoder module to test (default: qrcode)')
+    parser.add_argument('--golden', default=GOLDEN_FILE,
+                        help='golden digest file')
+    parser.add_argument('--update', action='store_true',
+                        help='re-freeze the golden file from the current encoder')
+    parser.add_argument('--bench', action='store_true',
+                        help='time the encoder hot paths per version')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='minimum seconds spent timing each figure')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    qr = importlib.import_module(args.module)
+
+    if args.update:
+        WriteGolden(args.golden, GenerateDigests(qr))
+        print('Golden file written to %s' % args.golden)
+    elif args.bench:
+        Bench(qr, args.min_time)
+    else:
+        sys.exit(1 if Check(qr, args.golden) else 0)
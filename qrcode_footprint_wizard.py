@@ -76,63 +76,70 @@ class QRCodeWizard(FootprintWizardBase.FootprintWizard):
         return polygon
 
 
-    def _drawPixel(self, xposition, yposition):
-        # build a rectangular pad as a dot on copper layer,
-        # and a polygon (a square) on silkscreen
+    def _drawPixels(self, positions):
+        # build rectangular pads as dots on copper layer,
+        # and polygons (squares) on silkscreen, one per (x, y) position
         if self.UseCu:
-            pad = pcbnew.D_PAD(self.module)
-            pad.SetSize(pcbnew.wxSize(self.X, self.X))
-            pad.SetPosition(pcbnew.wxPoint(xposition,yposition))
-            pad.SetShape(pcbnew.PAD_SHAPE_RECT)
-            pad.SetAttribute(pcbnew.PAD_ATTRIB_SMD)
-            pad.SetName("")
+            # all the dots share one prototype, only the position differs
+            proto = pcbnew.D_PAD(self.module)
+            proto.SetSize(pcbnew.wxSize(self.X, self.X))
+            proto.SetShape(pcbnew.PAD_SHAPE_RECT)
+            proto.SetAttribute(pcbnew.PAD_ATTRIB_SMD)
+            proto.SetName("")
             layerset = pcbnew.LSET()
             layerset.AddLayer(pcbnew.F_Cu)
             layerset.AddLayer(pcbnew.F_Mask)
-            pad.SetLayerSet( layerset )
-            self.module.Add(pad)
+            proto.SetLayerSet( layerset )
+            for xposition, yposition in positions:
+                pad = proto.Duplicate()
+                pad.SetPosition(pcbnew.wxPoint(xposition, yposition))
+                self.module.Add(pad)
         if self.UseSilkS:
-            polygon=self.drawSquareArea(pcbnew.F_SilkS, self.X, xposition, yposition)
-            self.module.Add(polygon)
-
+            for xposition, yposition in positions:
+                polygon=self.drawSquareArea(pcbnew.F_SilkS, self.X, xposition, yposition)
+                self.module.Add(polygon)
+
+    def _packedBitmap(self):
+        # The QR modules with the border added and the negative applied,
+        # as one integer per line: the most significant of the sz bits is
+        # the leftmost column
+        border = max(self.border, 0)
+        sz = len(self.qr.modules) + (border * 2)
+        # Negative is a boolean; each pixel is a boolean (need to draw or
+        # not), so a pixel is drawn when Negative Xor Pixel: inverting a
+        # whole line is a single Xor with an all-ones mask
+        invert = (1 << sz) - 1 if self.negative else 0
+        lines = [invert] * border
+        for line in self.qr.modules:
+            bits = ''.join(['1' if pixel else '0' for pixel in line])
+            lines.append((int(bits, 2) << border) ^ invert)
+        lines += [invert] * border
+        return sz, lines
+
+    def _darkPositions(self, sz, lines):
+        # Convert the packed lines into the centre of every pixel to draw
+        # Center position of QrCode
+        origin = - int(sz / 2 * self.X)
+        # position of each column, computed once for all the lines
+        columns = [origin + col * self.X for col in range(sz)]
+        fmt = '0%db' % sz
+        positions = []
+        for row, line in enumerate(lines):
+            if not line:
+                continue
+            yposition = origin + row * self.X
+            bits = format(line, fmt)
+            positions += [(columns[col], yposition)
+                          for col, bit in enumerate(bits) if bit == '1']
+        return positions
 
     def BuildThisFootprint(self):
-        if self.border >= 0:
-            # Adding border: Create a new array larger than the self.qr.modules
-            sz = self.qr.modules.__len__() + (self.border * 2)
-            arrayToDraw = [ [ 0 for a in range(sz) ] for b in range(sz) ]
-            lineposition = self.border
-            for i in self.qr.modules:
-                columnposition = self.border
-                for j in i:
-                    arrayToDraw[lineposition][columnposition] = j
-                    columnposition += 1
-                lineposition += 1
-        else:
-            # No border: using array as is
-            arrayToDraw = self.qr.modules
+        sz, lines = self._packedBitmap()
+        self._drawPixels(self._darkPositions(sz, lines))
 
         # used many times...
-        half_number_of_elements = arrayToDraw.__len__() / 2
+        half_number_of_elements = sz / 2
 
-        # Center position of QrCode
-        yposition = - int(half_number_of_elements * self.X)
-        for line in arrayToDraw:
-            xposition = - int(half_number_of_elements * self.X)
-            for pixel in line:
-                # Trust table for drawing a pixel
-                # Negative is a boolean;
-                # each pixel is a boolean (need to draw of not)
-                # Negative | Pixel | Result
-                #        0 |     0 | 0
-                #        0 |     1 | 1
-                #        1 |     0 | 1
-                #        1 |     1 | 0
-                # => Draw as Xor
-                if self.negative != pixel: # Xor...
-                    self._drawPixel(xposition, yposition)
-                xposition += self.X
-            yposition += self.X
         #int((5 + half_number_of_elements) * self.X))
         textPosition = int((self.textHeight) + ((1 + half_number_of_elements) * self.X))
         self.module.Value().SetPosition(pcbnew.wxPoint(0, - textPosition))
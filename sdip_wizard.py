@@ -40,6 +40,9 @@ class RowedGridArray(PA.PadGridArray):
 
 class RowedFootprint(FootprintWizardBase.FootprintWizard):
 
+    recordGraphics = True
+    clipSilkscreen = True
+
     pad_count_key = 'pad count'
     row_count_key = 'row count'
     row_spacing_key = 'row spacing'
@@ -101,19 +104,9 @@ class RowedFootprint(FootprintWizardBase.FootprintWizard):
 
         self.DrawBox(ssx, ssy)
 
-        # Courtyard
+        # Courtyard around the pads and the silkscreen body outline
         cmargin = self.draw.GetLineThickness()
-        self.draw.SetLayer(pcbnew.F_CrtYd)
-        sizex = (ssx + cmargin) * 2
-        sizey = (ssy + cmargin) * 2
-        # round size to nearest 0.1mm, rectangle will thus land on a 0.05mm grid
-        sizex = pcbnew.PutOnGridMM(sizex, 0.1)
-        sizey = pcbnew.PutOnGridMM(sizey, 0.1)
-        # set courtyard line thickness to the one defined in KLC
-        self.draw.SetLineThickness(pcbnew.FromMM(0.05))
-        self.draw.Box(0, 0, sizex, sizey)
-        # restore line thickness to previous value
-        self.draw.SetLineThickness(pcbnew.FromMM(cmargin))
+        self.draw.AutoCourtyard(cmargin, layers=(pcbnew.F_SilkS,))
 
         #reference and value
         text_size = self.GetTextSize()  # IPC nominal
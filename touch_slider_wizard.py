@@ -21,11 +21,300 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
 #
 
+from __future__ import division
+
+import math
+
 from pcbnew import *
 import FootprintWizardBase
 import pcbnew
 
-class TouchSliderWizard(FootprintWizardBase.FootprintWizard):
+# Electrode geometry engine, shared by the slider, wheel and matrix
+# wizards. Every generator returns the electrodes as
+# (name, x, y, anchor size, outline, back) tuples in board units: the
+# pad position, the (w, h) of the rectangular or circular anchor, the
+# pad outline relative to the pad position (None for a plain
+# rectangle) and whether the electrode is on the back copper.
+# Electrodes of the same kind share one outline list.
+
+def _Integer(pts):
+    return [(int(round(x)), int(round(y))) for x, y in pts]
+
+def ChevronOutlines(step_length, clearance, width):
+    """
+    Outlines of the start, middle and final electrodes of a strip,
+    relative to the step centre.
+
+    Every electrode has a rectangular core of half the step (less the
+    clearance) with a chevron notch on the right; the notch receives the
+    chevron point on the left of the next electrode. The start electrode
+    has no point on the left, and the final one no notch on the right;
+    both are extended by a third of the step on their outer side instead.
+    """
+    half = (step_length - clearance) / 2
+    w = width / 2
+
+    notch = [(1.5 * half, -w), (0.5 * half, 0), (1.5 * half, w)]
+    point = [(-1.5 * half, 0)]
+    outer = 7 * half / 6
+
+    start = [(-outer, -w)] + notch + [(-outer, w)]
+    middle = [(-0.5 * half, -w)] + notch + [(-0.5 * half, w)] + point
+    final = [(-0.5 * half, -w), (outer, -w), (outer, w),
+             (-0.5 * half, w)] + point
+
+    return start, middle, final
+
+def SliderElectrodes(steps, bands, length, width, clearance):
+    """
+    Linear slider: steps interlocking electrodes along x, repeated in
+    bands along y. The electrodes of each band are named 1 to steps, so
+    the bands are connected in parallel
+    """
+    step = length / steps
+    band = width / bands
+    start, middle, final = [_Integer(outline) for outline in
+                            ChevronOutlines(step, clearance, band)]
+    kinds = [start] + [middle] * (steps - 2) + [final]
+    anchor = ((step - clearance) / 2, band)
+
+    x0 = -0.5 * (steps - 1) * step
+    y0 = -0.5 * (bands - 1) * band
+
+    return [(str(n + 1), x0 + n * step, y0 + b * band, anchor, kinds[n],
+             False) for b in range(bands) for n in range(steps)]
+
+def WheelElectrodes(steps, bands, outer, width, clearance,
+                    max_angle=math.radians(5)):
+    """
+    Circular wheel: the middle slider electrode wrapped around a ring,
+    numbered clockwise from the top, and repeated in concentric bands
+    across the ring width. The electrodes of each band are named 1 to
+    steps, so the bands are connected in parallel.
+
+    The chevron profile (u along the strip, v across it) is mapped to
+    polar co-ordinates with theta = u / band inner radius and r = band
+    mean radius + v, so the gaps along the ring are the slider's gaps at
+    the inner edge and wider outwards: the clearance between the ends,
+    and clearance.w / sqrt(w^2 + h^2) across the chevron edges, as on
+    the slider. Edges are subdivided to at most max_angle before
+    mapping, which turns the straight edges into arcs.
+    """
+    band = (width - (bands - 1) * clearance) / bands
+
+    electrodes = []
+    for b in range(bands):
+        ri = outer / 2 - width + b * (band + clearance)
+        ro = ri + band
+        rm = (ri + ro) / 2
+        step = 2 * math.pi * ri / steps
+
+        profile = ChevronOutlines(step, clearance, band)[1]
+
+        polar = []
+        for (u0, v0), (u1, v1) in zip(profile, profile[1:] + profile[:1]):
+            k = max(1, int(math.ceil(abs(u1 - u0) / ri / max_angle)))
+            polar += [((u0 + (u1 - u0) * i / k) / ri, rm + v0 + (v1 - v0) * i / k)
+                      for i in range(k)]
+
+        # a circular anchor inside the electrode core
+        half = (step - clearance) / 2
+        size = min(half, band) / 2
+        anchor = (size, size)
+
+        for n in range(steps):
+            a = 2 * math.pi * n / steps - math.pi / 2
+            cx, cy = rm * math.cos(a), rm * math.sin(a)
+            outline = _Integer([(r * math.cos(a + t) - cx, r * math.sin(a + t) - cy)
+                                for t, r in polar])
+            electrodes.append((str(n + 1), cx, cy, anchor, outline, False))
+
+    return electrodes
+
+def DiamondChain(count, pitch, half_along, half_across, neck):
+    """
+    Outline of a chain of count diamonds along x, centred on the origin:
+    diamonds of the given half diagonals, pitch apart, joined tip to tip
+    by a neck of the given width
+    """
+    h = neck / 2
+    # where the diamond edges come within h of the chain axis
+    inset = half_along * (1 - h / half_across)
+    x0 = -pitch * (count - 1) / 2
+
+    upper = [(x0 - half_along, 0)]
+    for i in range(count):
+        x = x0 + pitch * i
+        upper.append((x, -half_across))
+        if i < count - 1:
+            upper += [(x + inset, -h), (x + pitch - inset, -h)]
+    upper.append((x0 + pitch * (count - 1) + half_along, 0))
+
+    return upper + [(x, -y) for x, y in reversed(upper[1:-1])]
+
+def MatrixElectrodes(columns, rows, length, width, clearance):
+    """
+    XY touch matrix: interleaved diamond electrodes over a length by
+    width area, columns X electrodes running down on the back copper and
+    rows Y electrodes running across on the front copper.
+
+    The X diamonds sit on the grid points and the Y diamonds on the cell
+    centres, so together they tile the area. Every diamond is shrunk so
+    that its edges keep the clearance, measured square to the edges,
+    from the diamonds of the other layer. The diamonds of an electrode
+    are joined tip to tip by necks as wide as the clearance; the X and Y
+    necks cross each other on their two layers.
+    """
+    px = length / columns
+    py = width / rows
+
+    # the tiling diamonds, shrunk by half the clearance square to their
+    # edges
+    a, b = px / 2, py / 2
+    scale = 1 - clearance / 2 * math.hypot(a, b) / (a * b)
+    a, b = a * scale, b * scale
+
+    column = _Integer([(y, x) for x, y in DiamondChain(rows, py, b, a, clearance)])
+    row = _Integer(DiamondChain(columns, px, a, b, clearance))
+    anchor = (clearance, clearance)
+
+    # the Y diamonds are half a cell right of and below the X ones, so
+    # both sets are moved back a quarter cell to centre the pattern
+    x0 = -0.5 * (columns - 1) * px - px / 4
+    y0 = -0.5 * (rows - 1) * py - py / 4
+
+    return ([("X%d" % (c + 1), x0 + c * px, -py / 4, anchor, column, True)
+             for c in range(columns)] +
+            [("Y%d" % (r + 1), px / 4, y0 + py / 2 + r * py, anchor, row, False)
+             for r in range(rows)])
+
+def TouchElectrodes(layout, steps, bands, length, width, clearance):
+    """
+    The electrodes of any layout from the one parameter set shared by
+    the touch wizards:
+
+        layout   'slider', 'wheel' or 'matrix'
+        steps    electrodes along the slider or around the wheel, or
+                 matrix columns (X electrodes)
+        bands    parallel bands across the slider or the wheel ring, or
+                 matrix rows (Y electrodes)
+        length   slider length, wheel outer diameter or matrix width
+        width    slider width, wheel ring width or matrix height
+        clearance  the gap between electrodes
+
+    @return list of (name, x, y, anchor size, outline, on the back) tuples
+    """
+    if layout == 'slider':
+        return SliderElectrodes(steps, bands, length, width, clearance)
+    if layout == 'wheel':
+        return WheelElectrodes(steps, bands, length, width, clearance)
+    if layout == 'matrix':
+        return MatrixElectrodes(steps, bands, length, width, clearance)
+    raise ValueError("Unknown touch layout: %s" % layout)
+
+
+class TouchElectrodeWizard(FootprintWizardBase.FootprintWizard):
+    """
+    Common parts of the touch electrode wizards: one parameter set, read
+    by TouchElectrodes() according to the layout
+    """
+
+    layout = None
+
+    # shape of the anchor pad of the custom electrodes
+    anchor_shape = PAD_SHAPE_RECT
+
+    # defaults and hints of the shared parameters, by layout
+    defaults = {'steps': 4, 'bands': 2, 'width': 10, 'length': 50,
+                'clearance': 1}
+    hints = {}
+    min_steps = 2
+
+    def GenerateParameterList(self):
+        d = self.defaults
+        self.AddParam("Pads", "steps", self.uInteger, d['steps'],
+                      min_value=self.min_steps, hint=self.hints.get('steps'))
+        self.AddParam("Pads", "bands", self.uInteger, d['bands'], min_value=1,
+                      hint=self.hints.get('bands'))
+        self.AddParam("Pads", "width", self.uMM, d['width'],
+                      hint=self.hints.get('width'))
+        self.AddParam("Pads", "length", self.uMM, d['length'],
+                      hint=self.hints.get('length'))
+        self.AddParam("Pads", "clearance", self.uMM, d['clearance'])
+
+    @property
+    def pads(self):
+        return self.parameters['Pads']
+
+    # build a custom shape pad: an anchor pad of the given size merged
+    # with an outline polygon, relative to the pad position. Without an
+    # outline, the pad is a plain rectangle
+    def smdCustomPad(self,module,size,pos,name,outline=None,back=False):
+        pad = D_PAD(module)
+        pad.SetSize(size)
+        if outline is None:
+            pad.SetShape(PAD_SHAPE_RECT)
+        else:
+            pad.SetShape(PAD_SHAPE_CUSTOM)
+            pad.SetAnchorPadShape(self.anchor_shape)
+        pad.SetAttribute(PAD_ATTRIB_SMD)
+        if back:
+            pad.SetLayerSet(LSET(B_Cu))
+        else:
+            pad.SetLayerSet(pad.ConnSMDMask())
+        pad.SetPos0(pos)
+        pad.SetPosition(pos)
+        pad.SetName(name)
+        if outline is not None:
+            pad.AddPrimitive(outline, 0)
+        return pad
+
+    def AddElectrodes(self, electrodes):
+        # convert each distinct outline to a wxPoint_Vector only once
+        vectors = {}
+        for name, x, y, size, outline, back in electrodes:
+            if outline is not None:
+                key = id(outline)
+                if key not in vectors:
+                    vectors[key] = wxPoint_Vector(
+                        [wxPoint(px, py) for px, py in outline])
+                outline = vectors[key]
+            pad = self.smdCustomPad(self.module,
+                                    wxSize(int(size[0]), int(size[1])),
+                                    wxPoint(int(round(x)), int(round(y))),
+                                    name, outline, back)
+            self.module.Add(pad)
+
+    # Value and reference above the electrodes, whose top edge is at -top
+    def AddText(self, top):
+        t_size = self.GetTextSize()
+        w_text = self.draw.GetLineThickness()
+        ypos = top + t_size/2 + w_text
+        self.draw.Value(0, -ypos, t_size)
+        ypos += t_size + w_text*2
+        self.draw.Reference(0, -ypos, t_size)
+
+    # the top edge of the electrodes
+    def Top(self):
+        return self.pads['width']/2
+
+    def BuildThisFootprint(self):
+        self.AddText(self.Top())
+
+        # set SMD attribute
+        self.module.SetAttributes(MOD_CMS)
+
+        self.AddElectrodes(TouchElectrodes(self.layout,
+                                           self.pads['steps'],
+                                           self.pads['bands'],
+                                           self.pads['length'],
+                                           self.pads['width'],
+                                           self.pads['clearance']))
+
+
+class TouchSliderWizard(TouchElectrodeWizard):
+
+    layout = 'slider'
 
     def GetName(self):
         """
@@ -48,160 +337,110 @@ class TouchSliderWizard(FootprintWizardBase.FootprintWizard):
             y = pcbnew.ToMM(self.pads['width'])
             )
 
-    def GenerateParameterList(self):
-        self.AddParam("Pads", "steps", self.uInteger, 4, min_value=2)
-        self.AddParam("Pads", "bands", self.uInteger, 2, min_value=1)
-        self.AddParam("Pads", "width", self.uMM, 10)
-        self.AddParam("Pads", "length", self.uMM, 50)
-        self.AddParam("Pads", "clearance", self.uMM, 1)
+    # This method checks the parameters provided to wizard and set errors
+    def CheckParameters(self):
+        #TODO - implement custom checks
+        pass
 
-    @property
-    def pads(self):
-        return self.parameters['Pads']
+TouchSliderWizard().register()
 
-    # build a rectangular pad
-    def smdRectPad(self,module,size,pos,name):
-        pad = D_PAD(module)
-        pad.SetSize(size)
-        pad.SetShape(PAD_SHAPE_RECT)
-        pad.SetAttribute(PAD_ATTRIB_SMD)
-        pad.SetLayerSet(pad.ConnSMDMask())
-        pad.SetPos0(pos)
-        pad.SetPosition(pos)
-        pad.SetName(name)
-        return pad
 
+class TouchWheelWizard(TouchElectrodeWizard):
 
-    def smdTrianglePad(self,module,size,pos,name,up_down=1,left_right=0):
-        pad = D_PAD(module)
-        pad.SetSize(wxSize(size[0],size[1]))
-        pad.SetShape(PAD_SHAPE_TRAPEZOID)
-        pad.SetAttribute(PAD_ATTRIB_SMD)
-        pad.SetLayerSet(pad.ConnSMDMask())
-        pad.SetPos0(pos)
-        pad.SetPosition(pos)
-        pad.SetName(name)
-        pad.SetDelta(wxSize(left_right*size[1],up_down*size[0]))
-        return pad
+    layout = 'wheel'
+    anchor_shape = PAD_SHAPE_CIRCLE
 
+    defaults = {'steps': 8, 'bands': 1, 'width': 10, 'length': 30,
+                'clearance': 0.5}
+    hints = {'steps': "Electrodes around the wheel",
+             'bands': "Concentric bands across the ring",
+             'width': "Ring width",
+             'length': "Outer diameter"}
+    min_steps = 3
+
+    def GetName(self):
+        return 'Touch Wheel'
+
+    def GetDescription(self):
+        return 'Capacitive Touch Wheel wizard'
+
+    def GetValue(self):
+        return "TouchWheel-{s}_{d:g}mm".format(
+            s = self.pads['steps'],
+            d = pcbnew.ToMM(self.pads['length'])
+            )
 
-    # This method checks the parameters provided to wizard and set errors
     def CheckParameters(self):
-        #TODO - implement custom checks
-        pass
+        outer = self.pads['length']
+        width = self.pads['width']
+        bands = self.pads['bands']
+        clearance = self.pads['clearance']
 
-    # The start pad is made of a rectangular pad plus a couple of
-    # triangular pads facing tips on the middle/right of the first
-    # rectangular pad
-    def AddStartPad(self,position,touch_width,step_length,clearance,name):
-        module = self.module
-        step_length = step_length - clearance
-        size_pad = wxSize(step_length/2.0+(step_length/3),touch_width)
-        pad = self.smdRectPad(module,size_pad,position-wxPoint(step_length/6,0),name)
-        module.Add(pad)
-
-        size_pad = wxSize(step_length/2.0,touch_width)
-
-        tp = self.smdTrianglePad(module,wxSize(size_pad[0],size_pad[1]/2),
-                                 position+wxPoint(size_pad[0]/2,size_pad[1]/4),
-                                name)
-        module.Add(tp)
-        tp = self.smdTrianglePad(module,wxSize(size_pad[0],size_pad[1]/2),
-                                 position+wxPoint(size_pad[0]/2,-size_pad[1]/4),
-                                name
-                                ,-1)
-        module.Add(tp)
-
-    # compound a "start pad" shape plus a triangle on the left, pointing to
-    # the previous touch-pad
-    def AddMiddlePad(self,position,touch_width,step_length,clearance,name):
-        module = self.module
-        step_length = step_length - clearance
-        size_pad = wxSize(step_length/2.0,touch_width)
-
-        size_pad = wxSize(step_length/2.0,touch_width)
-        pad = self.smdRectPad(module,size_pad,position,name)
-        module.Add(pad)
-
-        tp = self.smdTrianglePad(module,wxSize(size_pad[0],size_pad[1]/2),
-                                 position+wxPoint(size_pad[0]/2,size_pad[1]/4),
-                                name)
-        module.Add(tp)
-        tp = self.smdTrianglePad(module,wxSize(size_pad[0],size_pad[1]/2),
-                                 position+wxPoint(size_pad[0]/2,-size_pad[1]/4),
-                                name
-                                ,-1)
-        module.Add(tp)
-
-        tp = self.smdTrianglePad(module,wxSize(size_pad[0],size_pad[1]/2),
-                                        position+wxPoint(-size_pad[0],0),
-                                        name,
-                                        0,
-                                        -1)
-        module.Add(tp)
-
-
-    def AddFinalPad(self,position,touch_width,step_length,clearance,name):
-        module = self.module
-        step_length = step_length - clearance
-        size_pad = wxSize(step_length/2.0,touch_width)
-
-        pad = self.smdRectPad(module,
-                              wxSize(size_pad[0]+(step_length/3),size_pad[1]),
-                              position+wxPoint(step_length/6,0),
-                              name)
-        module.Add(pad)
-
-        tp = self.smdTrianglePad(module,wxSize(size_pad[0],size_pad[1]/2),
-                                        position+wxPoint(-size_pad[0],0),
-                                        name,
-                                        0,
-                                        -1)
-        module.Add(tp)
-
-    def AddStrip(self,pos,steps,touch_width,step_length,touch_clearance):
-        self.AddStartPad(pos,touch_width,step_length,touch_clearance,"1")
-
-        for n in range(2,steps):
-            pos = pos + wxPoint(step_length,0)
-            self.AddMiddlePad(pos,touch_width,step_length,touch_clearance,str(n))
-
-        pos = pos + wxPoint(step_length,0)
-        self.AddFinalPad(pos,touch_width,step_length,touch_clearance,str(steps))
-
-    # build the footprint from parameters
-    # FIX ME: the X and Y position of the footprint can be better.
-    def BuildThisFootprint(self):
+        if 2 * width >= outer:
+            self.GetParam('Pads', 'width').AddError(
+                "Ring width must be less than the outer radius")
+            return
 
-        steps             = self.pads["steps"]
-        bands             = self.pads["bands"]
-        touch_width       = self.pads["width"]
-        touch_length      = self.pads["length"]
-        touch_clearance   = self.pads["clearance"]
+        if (bands - 1) * clearance >= width:
+            self.GetParam('Pads', 'bands').AddError(
+                "Too many bands for the ring width and clearance")
+            return
 
-        step_length = float(touch_length) / float(steps)
+        # the electrode core, half the step at the inner edge, must
+        # survive the clearance
+        step = math.pi * (outer - 2 * width) / self.pads['steps']
+        if step <= clearance:
+            self.GetParam('Pads', 'clearance').AddError(
+                "Clearance too large for the number of steps",
+                "max {c:g}mm".format(c = pcbnew.ToMM(step)))
 
-        t_size = self.GetTextSize()
-        w_text = self.draw.GetLineThickness()
-        ypos = touch_width/2 + t_size/2 + w_text
-        self.draw.Value(0, -ypos, t_size)
-        ypos += t_size + w_text*2
-        self.draw.Reference(0, -ypos, t_size)
+    def Top(self):
+        return self.pads['length']/2
 
-        # set SMD attribute
-        self.module.SetAttributes(MOD_CMS)
+TouchWheelWizard().register()
 
-        # starting pad
-        band_width = touch_width/bands
 
-        xpos = -0.5 * (steps - 1) * step_length
-        ypos = -0.5 * (bands - 1) * band_width
+class TouchMatrixWizard(TouchElectrodeWizard):
 
-        pos = wxPointMM(pcbnew.ToMM(xpos), pcbnew.ToMM(ypos))
+    layout = 'matrix'
 
-        for b in range(bands):
-            self.AddStrip(pos,steps,band_width,step_length,touch_clearance)
-            pos += wxPoint(0,band_width)
+    defaults = {'steps': 8, 'bands': 8, 'width': 80, 'length': 80,
+                'clearance': 1}
+    hints = {'steps': "Columns (X electrodes)",
+             'bands': "Rows (Y electrodes)",
+             'width': "Height of the matrix",
+             'length': "Width of the matrix"}
+    min_steps = 1
 
-TouchSliderWizard().register()
+    def GetName(self):
+        return 'Touch Matrix'
+
+    def GetDescription(self):
+        return 'Capacitive XY Touch Matrix wizard'
 
+    def GetValue(self):
+        return "TouchMatrix-{x}x{y}_{w:g}x{h:g}mm".format(
+            x = self.pads['steps'],
+            y = self.pads['bands'],
+            w = pcbnew.ToMM(self.pads['length']),
+            h = pcbnew.ToMM(self.pads['width'])
+            )
+
+    def CheckParameters(self):
+        # the diamonds, shrunk for the clearance, must keep room for
+        # the necks
+        a = self.pads['length'] / self.pads['steps'] / 2
+        b = self.pads['width'] / self.pads['bands'] / 2
+        c = self.pads['clearance']
+        scale = 1 - c / 2 * math.hypot(a, b) / (a * b)
+
+        if min(a, b) * scale <= c:
+            self.GetParam('Pads', 'clearance').AddError(
+                "Clearance too large for the electrode pitch")
+
+    def Top(self):
+        # the Y diamonds stick out a quarter cell below, and the X ones
+        # a quarter cell above
+        return self.pads['width']/2 + self.pads['width']/self.pads['bands']/4
+
+TouchMatrixWizard().register()
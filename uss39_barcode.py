@@ -14,7 +14,6 @@
 #  MA 02110-1301, USA.
 
 from __future__ import division
-import functools
 import pcbnew as B
 import FootprintWizardBase
 
@@ -37,6 +36,11 @@ ptd = {
     '-': '010000101', '.': '110000100', ' ': '011000100', '*': '010010100',
     '$': '010101000', '/': '010100010', '+': '010001010', '%': '000101010'}
 
+# The same table precompiled to element widths in pixels (1 narrow,
+# 2 wide), alternately bar and space
+ptw = dict((c, tuple(int(bit) + 1 for bit in pattern))
+           for c, pattern in ptd.items())
+
 class Uss39:
      def __init__(self, text):
         self.Text = self.makePrintable(text)
@@ -44,14 +48,115 @@ class Uss39:
      __str__ = lambda self: self.Text
      makePrintable = lambda self, text: ''.join((c for c in text.upper() if c in ptd))
 
+     def getBarCodeRuns(self, text = None):
+        text = self.Text if text is None else self.makePrintable(text)
+        # Element widths with start and end characters, characters
+        # separated by a narrow inter-character gap
+        runs = []
+        for c in "*%s*" % text:
+            if runs:
+                runs.append(1)
+            runs.extend(ptw[c])
+        return runs
+
      def getBarCodePattern(self, text = None):
-        text = text if not(text is None) else self.Text
-        # Reformated text with start and end characters
-        return functools.reduce(lambda a1, a2: list(a1) + [0] + list(a2), [map(int, ptd[c]) for c in ("*%s*" % self.makePrintable(text))])
+        # 0 for narrow and 1 for wide elements
+        return [width - 1 for width in self.getBarCodeRuns(text)]
+
+# Code 128 element widths (bar, space, bar, space, bar, space) for the
+# symbol values 0-106; 106 is the stop pattern with its final bar
+c128 = [tuple(int(w) for w in pattern) for pattern in (
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213',
+    '122312', '132212', '221213', '221312', '231212', '112232', '122132',
+    '122231', '113222', '123122', '123221', '223211', '221132', '221231',
+    '213212', '223112', '312131', '311222', '321122', '321221', '312212',
+    '322112', '322211', '212123', '212321', '232121', '111323', '131123',
+    '131321', '112313', '132113', '132311', '211313', '231113', '231311',
+    '112133', '112331', '132131', '113123', '113321', '133121', '313121',
+    '211331', '231131', '213113', '213311', '213131', '311123', '311321',
+    '331121', '312113', '312311', '332111', '314111', '221411', '431111',
+    '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114',
+    '413111', '241112', '134111', '111242', '121142', '121241', '114212',
+    '124112', '124211', '411212', '421112', '421211', '212141', '214121',
+    '412121', '111143', '111341', '131141', '114113', '114311', '411113',
+    '411311', '113141', '114131', '311141', '411131', '211412', '211214',
+    '211232', '2331112')]
+
+class Code128:
+     # start codes and the code switching to each set
+     START = {'A': 103, 'B': 104, 'C': 105}
+     SWITCH = {'A': 101, 'B': 100, 'C': 99}
+     STOP = 106
+
+     def __init__(self, text):
+        self.Text = self.makePrintable(text)
+
+     __str__ = lambda self: self.Text
+     makePrintable = lambda self, text: ''.join((c for c in text if ord(c) < 128))
+
+     @staticmethod
+     def _digitRun(text, i):
+        n = 0
+        while i + n < len(text) and text[i + n].isdigit():
+            n += 1
+        return n
+
+     @staticmethod
+     def _charValue(c, cset):
+        # set A holds the control characters, set B the lower case letters
+        o = ord(c)
+        if cset == 'A' and o < 32:
+            return o + 64
+        return o - 32
+
+     def getSymbolValues(self, text = None):
+        text = self.Text if text is None else self.makePrintable(text)
+        # Data symbol values, with the start code but without the checksum
+        # and stop. Set C packs digit pairs and is used for runs of four
+        # or more digits, an odd leading digit going in set A or B
+        values = []
+        cset = None
+
+        def select(new):
+            values.append(self.SWITCH[new] if values else self.START[new])
+            return new
+
+        i = 0
+        while i < len(text):
+            run = self._digitRun(text, i)
+            if cset == 'C' and run >= 2:
+                values.append(int(text[i:i + 2]))
+                i += 2
+                continue
+            if cset != 'C' and run >= 4 and run % 2 == 0:
+                cset = select('C')
+                continue
+
+            o = ord(text[i])
+            if cset not in ('A', 'B') or (cset == 'A' and o >= 96) or \
+                    (cset == 'B' and o < 32):
+                cset = select('A' if o < 32 else 'B')
+            values.append(self._charValue(text[i], cset))
+            i += 1
+
+        if not values:
+            values.append(self.START['B'])
+        return values
+
+     def getBarCodeRuns(self, text = None):
+        # Element widths, alternately bar and space: the symbols, the
+        # modulo 103 checksum and the stop pattern
+        values = self.getSymbolValues(text)
+        checksum = (values[0] + sum(i * v for i, v in enumerate(values[1:], 1))) % 103
+        runs = []
+        for v in values + [checksum, self.STOP]:
+            runs.extend(c128[v])
+        return runs
 
 class Uss39Wizard(FootprintWizardBase.FootprintWizard):
     GetName = lambda self: 'BARCODE USS-39'
-    GetDescription = lambda self: 'USS-39 Barcode'
+    GetDescription = lambda self: 'USS-39 or Code 128 Barcode'
     GetReferencePrefix = lambda self: 'BARCODE'
     GetValue = lambda self: self.module.Value().GetText()
 
@@ -61,6 +166,7 @@ class Uss39Wizard(FootprintWizardBase.FootprintWizard):
         self.AddParam("Barcode", "Height", self.uMM, 3.0)
         self.AddParam("Barcode", "Margin", self.uMM, 2.0)
         self.AddParam("Barcode", "Contents", self.uString, 'BARCODE')
+        self.AddParam("Barcode", "Symbology", ["USS-39", "Code 128"], "USS-39")
 
         self.AddParam("Caption", "Enabled", self.uBool, True)
         self.AddParam("Caption", "Height", self.uMM, 1.2)
@@ -74,7 +180,11 @@ class Uss39Wizard(FootprintWizardBase.FootprintWizard):
         # Set quiet width to 10*X
         # User-defined parameters
         # Create barcode object
-        self.Barcode = Uss39('=' + str(self.parameters['Barcode']['Contents']))
+        contents = str(self.parameters['Barcode']['Contents'])
+        if self.parameters['Barcode']['Symbology'] == "Code 128":
+            self.Barcode = Code128(contents)
+        else:
+            self.Barcode = Uss39('=' + contents)
         self.X = int(self.parameters['Barcode']['Pixel Width'])
         self.module.Value().SetText( str(self.Barcode) )
         self.C = len(str(self.Barcode))
@@ -93,46 +203,47 @@ class Uss39Wizard(FootprintWizardBase.FootprintWizard):
         self.L = self.I * (1 + self.C) + (self.C + 2) * (6 * self.X + 3 * self.N * self.X) + 2 * self.Q
 
 
-    def __drawBar__(self, bit, x):
-        offset = (bit + 1) * self.X
-        return x + offset
-
-    def __drawSpace__(self, bit, x):
-        self.draw.SetLayer(B.F_SilkS)
-        self.draw.SetLineThickness(self.X)
-        self.draw.Line(x, 0, x, self.H)
-        if (bit == 1):
-            self.draw.Line(x + self.X, 0, x + self.X, self.H)
-            self.draw.Line(x + self.X/2, 0, x + self.X/2, self.H)
-            self.draw.Line(x, 0, x + self.X, 0)
-            self.draw.Line(x, self.H, x + self.X, self.H)
-        offset = (bit + 1) * self.X
-        return x + offset
+    def getBarRuns(self):
+        # Run-length encode the pattern into (x, width) runs, alternately
+        # bars and spaces, each 1 or 2 pixels wide
+        runs = []
+        x = 0
+        for pixels in self.Barcode.getBarCodeRuns():
+            width = pixels * self.X
+            runs.append((x, width))
+            x += width
+        return runs
 
     def drawBars(self):
-        x = 0
-        bars = self.Barcode.getBarCodePattern()
-        for index in range(0, len(bars), 2):
-            # Draw bar
-            barBit = bars[index]
-            x = self.__drawBar__(barBit, x)
-            # Draw space
-            if index < len(bars)-1:
-                spaceBit = bars[index + 1]
-                x = self.__drawSpace__(spaceBit, x)
-        return x
+        # Only the spaces (odd runs) are drawn, each as one filled
+        # rectangle spanning the bar height
+        self.draw.SetLayer(B.F_SilkS)
+        runs = self.getBarRuns()
+        for x, width in runs[1::2]:
+            self.draw.FilledBox(x - self.X / 2 + width / 2, self.H / 2,
+                                width, self.H)
+        x, width = runs[-1]
+        return x + width
 
     def drawQuietZone(self, x0, y0, width, height):
+        # A ring of width Q around the bars, as four filled rectangles:
+        # full width bands above and below, and the sides between them
         self.draw.SetLayer(B.F_SilkS)
-        self.draw.SetLineThickness(self.X)
 
-        for offset in range(0, int(self.Q), int(self.X/2)):
-            xoffset = offset + self.X
-            yoffset = offset + self.X/2
-            self.draw.Line(x0 - xoffset, -yoffset, width + xoffset, -yoffset)
-            self.draw.Line(x0 - xoffset, self.H+yoffset, width + xoffset, self.H+yoffset)
-            self.draw.Line(x0 - xoffset, -yoffset, x0-xoffset, self.H+yoffset)
-            self.draw.Line(width + xoffset, -yoffset, width+xoffset, self.H+yoffset)
+        left = x0 - self.X / 2
+        right = width + self.X / 2
+        top = y0
+        bottom = y0 + height
+        outer_w = right - left + 2 * self.Q
+
+        self.draw.FilledBox((left + right) / 2, top - self.Q / 2,
+                            outer_w, self.Q)
+        self.draw.FilledBox((left + right) / 2, bottom + self.Q / 2,
+                            outer_w, self.Q)
+        self.draw.FilledBox(left - self.Q / 2, (top + bottom) / 2,
+                            self.Q, height)
+        self.draw.FilledBox(right + self.Q / 2, (top + bottom) / 2,
+                            self.Q, height)
 
     def BuildThisFootprint(self):
         # Draw bars
@@ -148,4 +259,24 @@ class Uss39Wizard(FootprintWizardBase.FootprintWizard):
         self.draw.Circle(0, 0, B.FromMM(0.25))
         self.module.Value().SetLayer(B.F_Fab)
 
+    def BuildFootprints(self, serials):
+        # Batch entry point: build one barcode footprint per serial string,
+        # e.g. to label a production run, yielding each module as it is
+        # built. The other parameters are shared by the whole batch, and
+        # the Contents parameter is put back afterwards. A serial that
+        # fails the parameter checks raises ValueError with the build
+        # messages, rather than yielding an empty footprint
+        contents = self.GetParam("Barcode", "Contents")
+        saved = contents.raw_value
+        try:
+            for serial in serials:
+                contents.SetValue(serial)
+                self.BuildFootprint()
+                if self.AnyErrors():
+                    raise ValueError("Cannot build barcode {s!r}:\n{m}".format(
+                        s=serial, m=self.buildmessages))
+                yield self.module
+        finally:
+            contents.SetValue(saved)
+
 Uss39Wizard().register()
\ No newline at end of file
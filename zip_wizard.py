@@ -23,6 +23,9 @@ import PadArray as PA
 
 class RowedFootprint(FootprintWizardBase.FootprintWizard):
 
+    recordGraphics = True
+    clipSilkscreen = True
+
     def GenerateParameterList(self):
 
         # defaults for a ZIP package
@@ -87,21 +90,9 @@ class RowedFootprint(FootprintWizardBase.FootprintWizard):
 
         self.DrawBox(leftx*2, cornery*2)
 
-        # Courtyard
-        cmarginx = self.body['courtyard margin']
-        cmarginy = cmarginx
-        self.draw.SetLayer(pcbnew.F_CrtYd)
-        thick = self.draw.GetLineThickness()
-        sizex = (pin1posX + cmarginx) * 2 + pad_Hsize + thick
-        sizey = (pin1posY + cmarginy) * 2 + pad_Vsize + thick
-        # round size to nearest 0.1mm, rectangle will thus land on a 0.05mm grid
-        sizex = pcbnew.PutOnGridMM(sizex, 0.1)
-        sizey = pcbnew.PutOnGridMM(sizey, 0.1)
-        # set courtyard line thickness to the one defined in KLC
-        self.draw.SetLineThickness(pcbnew.FromMM(0.05))
-        self.draw.Box(0, 0, sizex, sizey)
-        # restore line thickness to previous value
-        self.draw.SetLineThickness(pcbnew.FromMM(thick))
+        # Courtyard around the pads and the silkscreen body outline
+        self.draw.AutoCourtyard(self.body['courtyard margin'],
+                                layers=(pcbnew.F_SilkS,))
 
         #reference and value
         text_size = self.GetTextSize()  # IPC nominal